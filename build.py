@@ -2,12 +2,54 @@
 Build script for creating OpenCut executable
 """
 
+import importlib.util
 import os
 import sys
 import subprocess
 import shutil
 
 
+# --add-data takes SOURCE;DEST on Windows and SOURCE:DEST elsewhere
+ADD_DATA_SRC = f'src{os.pathsep}src'
+
+# Large packages PyInstaller may pull in through optional imports but
+# that OpenCut never uses
+EXCLUDES = [
+    '--exclude-module', 'matplotlib',
+    '--exclude-module', 'scipy',
+    '--exclude-module', 'tkinter.test',
+]
+
+
+def upx_options():
+    """
+    Compress the bundled binaries with UPX when it is on PATH
+    
+    UPX makes the bundle much smaller, at the cost of unpacking each
+    compressed library as it is loaded. Without UPX the build stays
+    uncompressed instead of failing.
+    """
+    upx = shutil.which('upx')
+    if upx:
+        return ['--upx-dir', os.path.dirname(upx)]
+    print("UPX not found, bundling binaries uncompressed")
+    return ['--noupx']
+
+
+def ffmpeg_options():
+    """
+    Bundle imageio-ffmpeg's ffmpeg binary when it is installed
+    
+    The ffmpeg exports and low-memory recording look for ffmpeg on PATH
+    first and fall back to this binary, so without it the executable
+    depends on a system ffmpeg.
+    """
+    if importlib.util.find_spec('imageio_ffmpeg') is None:
+        print("imageio-ffmpeg not installed, the executable will need ffmpeg on PATH")
+        return []
+    return ['--hidden-import', 'imageio_ffmpeg', '--collect-data', 'imageio_ffmpeg']
+
+
 def clean_build():
     """Clean previous build artifacts"""
     dirs_to_remove = ['build', 'dist', '__pycache__']
@@ -27,22 +69,26 @@ def build_executable():
     """Build the executable using PyInstaller"""
     print("Building OpenCut executable...")
     
-    # PyInstaller command - Linux uses : separator
+    # PyInstaller command - the single file is unpacked to a temp
+    # directory on every launch, so it starts slower than --dir builds
     cmd = [
         'pyinstaller',
         '--onefile',
         '--windowed',
+        *upx_options(),
         '--name', 'OpenCut',
-        '--add-data', 'src:src',  # Linux uses : separator
+        '--add-data', ADD_DATA_SRC,
         '--hidden-import', 'tkinter',
         '--hidden-import', 'customtkinter',
         '--hidden-import', 'PIL',
         '--hidden-import', 'mss',
         '--hidden-import', 'imageio',
-        '--hidden-import', 'numpy',
-        '--collect-all', 'imageio',
+        '--collect-submodules', 'imageio.plugins.pillow',
+        '--collect-submodules', 'imageio.plugins.pillow_legacy',
         '--collect-all', 'mss',
         '--collect-all', 'customtkinter',
+        *ffmpeg_options(),
+        *EXCLUDES,
         'main.py'
     ]
     
@@ -64,16 +110,22 @@ def build_directory_mode():
     
     cmd = [
         'pyinstaller',
+        '--onedir',
         '--windowed',
+        *upx_options(),
         '--name', 'OpenCut',
-        '--add-data', 'src;src',
+        '--add-data', ADD_DATA_SRC,
         '--hidden-import', 'tkinter',
+        '--hidden-import', 'customtkinter',
         '--hidden-import', 'PIL',
         '--hidden-import', 'mss',
         '--hidden-import', 'imageio',
-        '--hidden-import', 'numpy',
-        '--collect-all', 'imageio',
+        '--collect-submodules', 'imageio.plugins.pillow',
+        '--collect-submodules', 'imageio.plugins.pillow_legacy',
         '--collect-all', 'mss',
+        '--collect-all', 'customtkinter',
+        *ffmpeg_options(),
+        *EXCLUDES,
         'main.py'
     ]
     
@@ -106,14 +158,15 @@ def main():
         if sys.argv[1] == '--clean':
             clean_build()
             return
-        elif sys.argv[1] == '--dir':
+        elif sys.argv[1] == '--onefile':
             clean_build()
-            build_directory_mode()
+            build_executable()
             return
     
-    # Default: clean and build single file executable
+    # Default: clean and build in directory mode, which starts without
+    # unpacking the bundle first (--dir is accepted for compatibility)
     clean_build()
-    build_executable()
+    build_directory_mode()
 
 
 if __name__ == "__main__":
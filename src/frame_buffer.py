@@ -0,0 +1,374 @@
+"""
+Frame Buffer Module
+Stores a recording as a single contiguous block of RGB frames
+"""
+
+from dataclasses import dataclass
+from typing import List, Optional, Tuple, Union
+import numpy as np
+
+try:
+    import cv2
+except ImportError:  # Optional, NumPy plane copies are used without it
+    cv2 = None
+
+
+# Values converted per pass by to_uint8, small enough to stay in cache
+TO_UINT8_CHUNK = 1 << 16
+
+# Frames in a FrameBufferWriter's first block
+WRITER_INITIAL_FRAMES = 32
+
+# Source channel of each output R, G, B channel, by color mode
+RGB_ORDER = {'RGB': (0, 1, 2), 'BGR': (2, 1, 0)}
+
+# OpenCV conversion codes, by (channel count, color mode)
+CV2_CODES = {} if cv2 is None else {
+    (3, 'BGR'): cv2.COLOR_BGR2RGB,
+    (4, 'BGR'): cv2.COLOR_BGRA2RGB,
+    (4, 'RGB'): cv2.COLOR_RGBA2RGB,
+}
+
+
+def to_uint8(frame: np.ndarray) -> np.ndarray:
+    """
+    Scale a 0-1 float frame (or block of frames) to uint8
+    
+    Values are scaled, clipped to 0-255 and cast a chunk at a time through
+    one small float32 buffer, so out-of-range values saturate instead of
+    wrapping and no full-size float temporary is ever allocated.
+    
+    With OpenCV installed, non-negative float32/float64 input goes through
+    its saturating SIMD convertScaleAbs instead, which rounds rather than
+    truncates. It takes the absolute value before saturating, so frames
+    with negative values keep the NumPy path where they clip to 0.
+    """
+    if (cv2 is not None and frame.dtype in (np.float32, np.float64)
+            and frame.size and frame.min() >= 0):
+        return cv2.convertScaleAbs(frame, alpha=255.0)
+        
+    src = frame.reshape(-1)
+    out = np.empty(src.shape, np.uint8)
+    scratch = np.empty(min(TO_UINT8_CHUNK, src.size), np.float32)
+    for start in range(0, src.size, TO_UINT8_CHUNK):
+        chunk = src[start:start + TO_UINT8_CHUNK]
+        scaled = scratch[:len(chunk)]
+        # Copy first: mixed-dtype multiplies (e.g. float16) are far slower
+        scaled[...] = chunk
+        scaled *= 255.0
+        np.clip(scaled, 0, 255, out=scaled)
+        out[start:start + len(chunk)] = scaled
+    return out.reshape(frame.shape)
+
+
+def to_rgb_contig(frame: np.ndarray, color_mode: str = 'RGB', out: np.ndarray = None) -> np.ndarray:
+    """
+    Copy (..., 1-4) or 2-D (H, W) uint8 frames into packed RGB
+    
+    Copying through a reversed or alpha-skipping view goes pixel by pixel,
+    so channels are copied as whole planes instead, or handed to OpenCV's
+    SIMD conversion for single frames when it is installed. Packed RGB
+    input is returned as-is when no `out` is given. Gray and gray+alpha
+    frames get their gray channel repeated, and alpha is dropped. A 2-D
+    array is one gray frame without a channel axis.
+    
+    Args:
+        frame: uint8 (H, W) frame, or frame or block of frames with 1 to 4 channels
+        color_mode: Input color mode - 'RGB' or 'BGR'
+        out: Optional (..., 3) uint8 destination
+        
+    Returns:
+        ndarray: C-contiguous (..., 3) uint8 RGB
+    """
+    if frame.ndim == 2:
+        frame = frame[..., np.newaxis]
+    channels = frame.shape[-1]
+    if channels == 3 and color_mode == 'RGB':
+        if out is None:
+            return np.ascontiguousarray(frame)
+        out[...] = frame
+        return out
+        
+    if channels < 3:
+        if out is None:
+            out = np.empty(frame.shape[:-1] + (3,), np.uint8)
+        out[...] = frame[..., :1]
+        return out
+        
+    code = CV2_CODES.get((channels, color_mode))
+    if code is not None and frame.ndim == 3:
+        return cv2.cvtColor(frame, code, dst=out)
+        
+    if out is None:
+        out = np.empty(frame.shape[:-1] + (3,), np.uint8)
+    for dst, src in enumerate(RGB_ORDER[color_mode]):
+        out[..., dst] = frame[..., src]
+    return out
+
+
+def to_packed_rgb(data: np.ndarray, color_mode: str = 'RGB', out: np.ndarray = None) -> np.ndarray:
+    """
+    Normalize (..., 1-4) or (H, W) frames of any dtype to packed uint8 RGB
+    
+    The one preprocessing step shared by the recorder, FrameBuffer and
+    every exporter: to_uint8() for float input, then to_rgb_contig().
+    """
+    if data.dtype != np.uint8:
+        data = to_uint8(data)
+    return to_rgb_contig(data, color_mode, out)
+
+
+@dataclass(frozen=True)
+class FrameMeta:
+    """
+    Layout shared by the frames of a recording, read from one frame
+    
+    Exporters choose their conversion path from this once per export, and
+    matches() is a cheap per-frame check that a frame still fits it.
+    """
+    shape: Tuple[int, int, int]
+    dtype: np.dtype
+    color_mode: str = 'RGB'
+    
+    @classmethod
+    def from_frame(cls, frame, color_mode: str = 'RGB') -> Optional['FrameMeta']:
+        """Describe an (H, W, C) ndarray frame, or return None for anything else"""
+        if not isinstance(frame, np.ndarray) or frame.ndim != 3:
+            return None
+        return cls(frame.shape, frame.dtype, color_mode)
+        
+    @property
+    def height(self) -> int:
+        """Frame height in pixels"""
+        return self.shape[0]
+        
+    @property
+    def width(self) -> int:
+        """Frame width in pixels"""
+        return self.shape[1]
+        
+    @property
+    def channels(self) -> int:
+        """Channels per pixel"""
+        return self.shape[2]
+        
+    @property
+    def is_packed_rgb(self) -> bool:
+        """Whether frames are already (H, W, 3) uint8 RGB"""
+        return self.channels == 3 and self.dtype == np.uint8 and self.color_mode == 'RGB'
+        
+    def matches(self, frame) -> bool:
+        """Check that a frame is an ndarray with this shape and dtype"""
+        return (isinstance(frame, np.ndarray)
+                and frame.shape == self.shape and frame.dtype == self.dtype)
+
+
+@dataclass
+class FrameBuffer:
+    """
+    Recording stored as (N, H, W, 3) uint8 C-contiguous frames
+    
+    Shape, dtype and channel layout are fixed for the whole buffer, so
+    consumers never need to inspect individual frames. Indexing and
+    iteration return zero-copy views.
+    
+    The frames usually live in one block. A FrameBufferWriter hands over
+    the blocks it filled as they are, and indexing and iteration walk
+    across them; only reading `data` joins them into one array.
+    
+    `repeats`, when set, holds how many capture intervals each frame stays
+    on screen for, so identical consecutive captures are stored only once.
+    """
+    blocks: List[np.ndarray]
+    fps: int = 15
+    repeats: Optional[np.ndarray] = None
+    
+    def __post_init__(self):
+        if isinstance(self.blocks, np.ndarray):
+            self.blocks = [self.blocks]
+        self._ends = np.cumsum([len(block) for block in self.blocks])
+        
+    @classmethod
+    def from_frames(cls,
+                    frames: Union['FrameBuffer', np.ndarray, List[np.ndarray]],
+                    fps: int = 15,
+                    color_mode: str = 'RGB',
+                    consume: bool = False) -> 'FrameBuffer':
+        """
+        Build a buffer from a list of frames or an (N, H, W, C) array
+        
+        Args:
+            frames: Frames of identical shape and dtype
+            fps: Frames per second of the recording
+            color_mode: Input color mode - 'RGB' or 'BGR'
+            consume: Empty the input list while packing it, so each source
+                frame can be freed as soon as it has been copied
+            
+        Returns:
+            FrameBuffer: The frames as packed uint8 RGB
+        """
+        if isinstance(frames, FrameBuffer):
+            return frames
+            
+        if isinstance(frames, np.ndarray):
+            if frames.ndim != 4 or frames.shape[-1] not in (1, 2, 3, 4):
+                raise ValueError(f"Expected (N, H, W, 1-4) frames, got {frames.shape}")
+            return cls([to_packed_rgb(frames, color_mode)], fps)
+            
+        if not cls.is_uniform(frames):
+            raise ValueError("Frames must all have the same shape and dtype")
+        height, width, channels = frames[0].shape
+        if channels not in (1, 2, 3, 4):
+            raise ValueError(f"Expected (H, W, 1-4) frames, got {frames[0].shape}")
+            
+        # Frames are normalized one at a time straight into the final block,
+        # so no stacked copy of the raw input is ever held next to it
+        data = np.empty((len(frames), height, width, 3), np.uint8)
+        for i in range(len(frames)):
+            to_packed_rgb(frames[i], color_mode, out=data[i])
+            if consume:
+                frames[i] = None
+        if consume:
+            frames.clear()
+            
+        return cls([data], fps)
+        
+    @staticmethod
+    def is_uniform(frames: List[np.ndarray]) -> bool:
+        """Check that frames are ndarrays sharing one (H, W, C) shape and dtype"""
+        if not frames:
+            return False
+        meta = FrameMeta.from_frame(frames[0])
+        return meta is not None and all(meta.matches(frame) for frame in frames)
+        
+    @property
+    def data(self) -> np.ndarray:
+        """
+        All frames as one (N, H, W, 3) array
+        
+        A buffer over several blocks is joined here the first time, which
+        briefly needs memory for both copies, so consumers that go frame
+        by frame should index or iterate the buffer instead.
+        """
+        if len(self.blocks) > 1:
+            self.blocks = [np.concatenate(self.blocks)]
+            self._ends = np.array([len(self.blocks[0])])
+        return self.blocks[0]
+        
+    @property
+    def count(self) -> int:
+        """Number of frames"""
+        return int(self._ends[-1])
+        
+    @property
+    def height(self) -> int:
+        """Frame height in pixels"""
+        return self.blocks[0].shape[1]
+        
+    @property
+    def width(self) -> int:
+        """Frame width in pixels"""
+        return self.blocks[0].shape[2]
+        
+    @property
+    def duration_seconds(self) -> float:
+        """Playback length at the buffer's frame rate"""
+        intervals = self.count if self.repeats is None else int(self.repeats.sum())
+        return intervals / self.fps if self.fps else 0.0
+        
+    def frame_durations(self, duration: int) -> List[int]:
+        """Display time of every frame, given the duration of one interval"""
+        if self.repeats is None:
+            return [duration] * self.count
+        return (self.repeats * duration).tolist()
+        
+    def __len__(self) -> int:
+        return self.count
+        
+    def __getitem__(self, index):
+        if len(self.blocks) == 1 or not isinstance(index, (int, np.integer)):
+            return self.data[index]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("frame index out of range")
+        block = int(np.searchsorted(self._ends, index, side='right'))
+        start = self._ends[block - 1] if block else 0
+        return self.blocks[block][index - start]
+        
+    def __iter__(self):
+        for block in self.blocks:
+            yield from block
+
+
+class FrameBufferWriter:
+    """
+    Collects frames of one size straight into preallocated blocks
+    
+    Each frame is converted into the next free slot of an (N, H, W, 3)
+    uint8 block. A full block is never grown in place: a new one twice
+    its size is started instead, so appending never copies earlier frames
+    and a long recording does not stall while it is being captured.
+    finish() hands the blocks out as they are, wrapped in a FrameBuffer,
+    so stopping a recording does not copy it either.
+    
+    With merge_duplicates, a frame identical to the one before it is not
+    stored; the previous frame's repeat count goes up instead.
+    """
+    
+    def __init__(self, height: int, width: int,
+                 capacity: int = WRITER_INITIAL_FRAMES,
+                 merge_duplicates: bool = False):
+        self.blocks = [np.empty((max(1, capacity), height, width, 3), np.uint8)]
+        self.count = 0
+        self.merge_duplicates = merge_duplicates
+        self.repeats: List[int] = []
+        self._used = 0  # Frames written to the last block
+        self._last: Optional[np.ndarray] = None
+        
+    def append(self, frame: np.ndarray, color_mode: str = 'RGB') -> bool:
+        """
+        Convert one (H, W, 3|4) frame into the next slot
+        
+        Returns:
+            bool: False if the frame repeated the previous one and was merged
+        """
+        block = self.blocks[-1]
+        if frame.shape[:2] != block.shape[1:3]:
+            raise ValueError(f"Expected {block.shape[1:3]} frames, got {frame.shape[:2]}")
+        if self._used == len(block):
+            block = np.empty((2 * len(block),) + block.shape[1:], np.uint8)
+            self.blocks.append(block)
+            self._used = 0
+        slot = to_packed_rgb(frame, color_mode, out=block[self._used])
+        # Encoders write slots to pipes and PIL buffers as they are, which
+        # only avoids a hidden copy while every slot stays C-contiguous
+        assert slot.flags.c_contiguous and np.shares_memory(slot, block)
+        
+        # The slot is simply reused by the next frame if this one is merged.
+        # A 1/64 subsample is compared first, so changed frames are
+        # usually told apart without a full comparison.
+        last = self._last
+        if (self.merge_duplicates and last is not None
+                and np.array_equal(slot[::8, ::8], last[::8, ::8])
+                and np.array_equal(slot, last)):
+            self.repeats[-1] += 1
+            return False
+            
+        self._last = slot
+        self.repeats.append(1)
+        self._used += 1
+        self.count += 1
+        return True
+        
+    def finish(self, fps: int = 15) -> FrameBuffer:
+        """Return the frames written so far as a FrameBuffer over the blocks"""
+        blocks = self.blocks[:-1] + [self.blocks[-1][:self._used]]
+        blocks = [block for block in blocks if len(block)] or blocks[-1:]
+        repeats = None
+        if any(repeat > 1 for repeat in self.repeats):
+            repeats = np.array(self.repeats)
+        return FrameBuffer(blocks, fps, repeats)
+        
+    def __len__(self) -> int:
+        return self.count
@@ -4,11 +4,328 @@ Handles conversion of frames to animated GIF with better color preservation
 """
 
 import os
-from typing import List, Optional
+import shutil
+import subprocess
+import threading
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple, Union
 import numpy as np
 from PIL import Image
 import imageio
 
+try:
+    from .frame_buffer import FrameBuffer, FrameMeta, to_packed_rgb, to_uint8
+    from . import palette as palettes
+    from .stream_encoder import StreamRecording, ffmpeg_executable
+except ImportError:
+    from frame_buffer import FrameBuffer, FrameMeta, to_packed_rgb, to_uint8
+    import palette as palettes
+    from stream_encoder import StreamRecording, ffmpeg_executable
+
+try:
+    import libimagequant as liq
+except ImportError:  # Optional, PIL's median cut is used without it
+    liq = None
+
+
+# Palette refinement, dithering and gifsicle lossiness used by export_gif
+# for each quality preset. Screen content is mostly flat UI and text, where
+# Floyd-Steinberg noise is slow (serial error diffusion) and breaks up the
+# long runs LZW compresses well, so only 'high' dithers.
+QUALITY_PRESETS = {
+    'low': {'kmeans': 0, 'dither': Image.Dither.NONE, 'lossy': 120},
+    'medium': {'kmeans': 2, 'dither': Image.Dither.NONE, 'lossy': 80},
+    'high': {'kmeans': 4, 'dither': Image.Dither.FLOYDSTEINBERG, 'lossy': None},
+}
+
+# PIL raw decoder that reads a frame straight into an RGB image, by
+# (channel count, color mode). PIL keeps RGB as 4 bytes per pixel, so
+# RGBA/BGRA frames are stripped of alpha (and RGBA even mapped without a
+# copy) by the decoder instead of by a separate conversion pass.
+RGB_RAW_MODES = {
+    (3, 'RGB'): 'RGB',
+    (4, 'RGB'): 'RGBX',
+    (3, 'BGR'): 'BGR',
+    (4, 'BGR'): 'BGRX',
+}
+
+# Worker threads used for per-frame quantization
+MAX_WORKERS = min(8, os.cpu_count() or 1)
+
+# Palette index reserved for "unchanged since the previous frame" pixels
+TRANSPARENT_INDEX = 255
+
+# libimagequant settings for per-frame palettes. Speed 8 is about as fast
+# as PIL's median cut; the default (3) is several times slower for little
+# visible gain on screen content.
+LIQ_SPEED = 8
+LIQ_DITHERING = 0.5
+
+# Maximum number of frames, and total pixels drawn from them, sampled when
+# building a global palette
+PALETTE_SAMPLE_FRAMES = 64
+PALETTE_SAMPLE_PIXELS = 200_000
+
+
+def _check_output_path(output_path: str):
+    """Fail fast on a non-GIF path, before any quantization work is done"""
+    if Path(output_path).suffix.lower() != '.gif':
+        raise ValueError(f"Output path must end in .gif: {output_path}")
+
+
+def _ensure_output_dir(output_path: str):
+    """Create the output file's directory, checking cheaply first if it exists"""
+    # resolve() walks every path component, which is slow on network drives
+    # and wasted in the usual case of saving into an existing folder
+    parent = os.path.dirname(output_path) or '.'
+    if not os.path.isdir(parent):
+        os.makedirs(parent, exist_ok=True)
+
+
+def _as_frame_buffer(frames, fps: int, color_mode: str, consume: bool = False) -> Optional[FrameBuffer]:
+    """Pack frames into a FrameBuffer, or return None if they are not uniform"""
+    if isinstance(frames, (FrameBuffer, np.ndarray)):
+        return FrameBuffer.from_frames(frames, fps=fps, color_mode=color_mode)
+    if FrameBuffer.is_uniform(frames):
+        return FrameBuffer.from_frames(frames, fps=fps, color_mode=color_mode,
+                                       consume=consume and isinstance(frames, list))
+    return None
+
+
+def _rgb_image(frame: np.ndarray, color_mode: str = 'RGB') -> Image.Image:
+    """Wrap an (H, W, 3|4) uint8 frame as an RGB image"""
+    # PIL silently copies strided arrays (e.g. a BGR view), so make one
+    # packed copy here only when the frame actually needs it
+    if not frame.flags.c_contiguous:
+        frame = np.ascontiguousarray(frame)
+    height, width = frame.shape[:2]
+    raw_mode = RGB_RAW_MODES[(frame.shape[2], color_mode)]
+    return Image.frombuffer('RGB', (width, height), frame, 'raw', raw_mode, 0, 1)
+
+
+def _load_into_scratch(scratch: threading.local, frame: np.ndarray) -> Image.Image:
+    """Copy a packed uint8 RGB frame into this thread's reusable RGB image"""
+    height, width = frame.shape[:2]
+    img = getattr(scratch, 'image', None)
+    if img is None or img.size != (width, height):
+        img = scratch.image = Image.new('RGB', (width, height))
+    img.frombytes(frame)
+    return img
+
+
+def _merge_duplicate_frames(frames: List[np.ndarray], frame_durations: List[int]):
+    """
+    Collapse runs of identical consecutive frames
+    
+    Args:
+        frames: Frames to merge
+        frame_durations: Display time of each frame in milliseconds
+        
+    Returns:
+        tuple: (kept frames, per-frame durations in milliseconds)
+    """
+    kept = []
+    durations = []
+    prev = None
+    for frame, duration in zip(frames, frame_durations):
+        # Compare a 1/64 subsample first; only frames that match there get
+        # the full comparison, so small changes like a cursor are never lost
+        if (isinstance(frame, np.ndarray) and isinstance(prev, np.ndarray)
+                and frame.shape == prev.shape
+                and np.array_equal(frame[::8, ::8], prev[::8, ::8])
+                and np.array_equal(frame, prev)):
+            durations[-1] += duration
+            continue
+        kept.append(frame)
+        durations.append(duration)
+        prev = frame
+    return kept, durations
+
+
+@contextmanager
+def _executor(workers: Optional[Executor]):
+    """Yield the caller's executor, or a private thread pool for one export"""
+    if workers is not None:
+        yield workers
+        return
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        yield executor
+
+
+# One reusable RGB image per worker thread, see _load_into_scratch()
+_scratch = threading.local()
+
+
+class _SharedFrame(NamedTuple):
+    """Picklable reference to one packed RGB frame in shared memory"""
+    name: str
+    shape: Tuple[int, int, int]
+    index: int
+
+
+@contextmanager
+def _frame_refs(frames: List[np.ndarray], executor: Executor):
+    """
+    Yield the packed frames in the form to submit to `executor`
+    
+    Process pool tasks pickle their arguments, which costs a full copy of
+    every frame in each direction. For a process pool the frames are
+    copied once into one shared memory block instead, and each task only
+    carries a small _SharedFrame. Other executors get the frames as they are.
+    """
+    if not isinstance(executor, ProcessPoolExecutor) or not frames:
+        yield frames
+        return
+    shape = frames[0].shape
+    shm = shared_memory.SharedMemory(create=True, size=len(frames) * frames[0].nbytes)
+    try:
+        block = np.ndarray((len(frames),) + shape, np.uint8, buffer=shm.buf)
+        for i, frame in enumerate(frames):
+            block[i] = frame
+        del block  # close() refuses while a view of the buffer exists
+        yield [_SharedFrame(shm.name, shape, i) for i in range(len(frames))]
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+@contextmanager
+def _attached(*frames):
+    """
+    Yield the frames as a list, with _SharedFrames replaced by array views
+    
+    A task attaches to the export's shared memory block only while it
+    runs, so the workers of a long-lived process pool never keep a
+    finished recording mapped. Views must not outlive the with block.
+    """
+    blocks = []
+    arrays = []
+    for frame in frames:
+        if isinstance(frame, _SharedFrame):
+            shm = shared_memory.SharedMemory(name=frame.name)
+            blocks.append(shm)
+            frame_bytes = int(np.prod(frame.shape))
+            frame = np.ndarray(frame.shape, np.uint8, buffer=shm.buf, offset=frame.index * frame_bytes)
+        arrays.append(frame)
+    frame = None
+    try:
+        yield arrays
+    finally:
+        arrays.clear()
+        for shm in blocks:
+            try:
+                shm.close()
+            except BufferError:
+                pass  # A view is still held by a traceback; freed along with it
+
+
+def _encode_frame(frame: np.ndarray,
+                  previous: Optional[np.ndarray],
+                  palette_data: List[int],
+                  dither: Image.Dither,
+                  transparency: Optional[int]) -> np.ndarray:
+    """
+    Map one packed RGB frame to (H, W) uint8 palette indices
+    
+    Takes plain arrays or _SharedFrames and returns an array, so it can run
+    in a process pool. Pixels equal to `previous` are set to the
+    transparent index, if there is one.
+    """
+    with _attached(frame, previous) as arrays:
+        return _index_frame(*arrays, palette_data, dither, transparency)
+
+
+def _index_frame(frame: np.ndarray,
+                 previous: Optional[np.ndarray],
+                 palette_data: List[int],
+                 dither: Image.Dither,
+                 transparency: Optional[int]) -> np.ndarray:
+    """_encode_frame() for frames that are plain arrays"""
+    # PIL's palette remap caches nearest-color lookups in C and runs in a
+    # few milliseconds per 1080p frame; a NumPy distance search over the
+    # palette is an order slower. With an exact palette the remap is
+    # lossless, so it also beats packing and searching the color codes.
+    img = _load_into_scratch(_scratch, frame)
+    indices = np.array(img.quantize(palette=_worker_palette_image(palette_data), dither=dither))
+    if previous is not None and transparency is not None:
+        indices[np.all(frame == previous, axis=-1)] = transparency
+    return indices
+
+
+def _worker_palette_image(palette_data: List[int]) -> Image.Image:
+    """
+    This thread's palette image for `palette_data`
+    
+    PIL fills its lookup cache per palette image, so each worker keeps
+    one of its own instead of sharing the export's image across threads
+    or paying for a cold cache on every frame.
+    """
+    if getattr(_scratch, 'palette_data', None) != palette_data:
+        _scratch.palette_img = palettes.palette_image(palette_data)
+        _scratch.palette_data = palette_data
+    return _scratch.palette_img
+
+
+def _liq_quantize(frame: np.ndarray) -> Image.Image:
+    """Give a packed RGB frame its own 256-color palette with libimagequant"""
+    height, width = frame.shape[:2]
+    rgba = getattr(_scratch, 'liq_rgba', None)
+    if rgba is None or rgba.shape[:2] != (height, width):
+        rgba = _scratch.liq_rgba = np.empty((height, width, 4), np.uint8)
+        rgba[..., 3] = 255
+    rgba[..., :3] = frame
+    
+    attr = getattr(_scratch, 'liq_attr', None)
+    if attr is None:
+        attr = _scratch.liq_attr = liq.Attr()
+        attr.max_colors = 256
+        attr.speed = LIQ_SPEED
+        
+    liq_image = attr.create_rgba(rgba, width, height, 0)
+    result = liq_image.quantize(attr)
+    result.dithering_level = LIQ_DITHERING
+    indices = np.frombuffer(result.remap_image(liq_image), np.uint8).reshape(height, width)
+    
+    # Wrap the remapped bytes as they are instead of copying them in
+    return palettes.indexed_image(indices, [channel for color in result.get_palette()
+                                            for channel in (color.r, color.g, color.b)])
+
+
+def _quantize_adaptive(img: Image.Image) -> Image.Image:
+    """Give one image its own 256-color palette"""
+    if liq is not None:
+        return _liq_quantize(np.asarray(img.convert('RGB')))
+    # Use a simple conversion without aggressive optimization
+    return img.quantize(method=Image.Quantize.MEDIANCUT, colors=256, kmeans=0)
+
+
+def _quantize_adaptive_frame(frame: np.ndarray) -> Image.Image:
+    """_quantize_adaptive() for a packed RGB frame, picklable for process pools"""
+    with _attached(frame) as arrays:
+        if liq is not None:
+            return _liq_quantize(arrays[0])
+        # Quantizing creates a new image, so the worker's RGB image is reused
+        return _quantize_adaptive(_load_into_scratch(_scratch, arrays[0]))
+
+
+def _ordered_imap(executor, fn, *iterables, window: int):
+    """
+    Like executor.map(), but lazy: at most `window` results are pending at
+    once and they are yielded in input order
+    """
+    pending = deque()
+    for args in zip(*iterables):
+        pending.append(executor.submit(fn, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
 
 class GIFExporter:
     """Handles GIF export functionality with improved color quality"""
@@ -17,90 +334,163 @@ class GIFExporter:
         self.default_fps = 15
         
     def export_gif(self, 
-                   frames: List[np.ndarray], 
+                   frames: Union[List[np.ndarray], FrameBuffer, StreamRecording], 
                    output_path: str, 
                    fps: Optional[int] = None,
                    quality: Optional[str] = None,
-                   color_mode: str = 'RGB') -> bool:
+                   color_mode: str = 'RGB',
+                   use_gifsicle: bool = True,
+                   fixed_palette=None,
+                   release_frames: bool = False,
+                   workers: Optional[Executor] = None) -> bool:
         """
         Export frames as animated GIF with high quality color preservation
         
         Args:
-            frames: List of numpy arrays (RGB images)
+            frames: List of numpy arrays (RGB images), a FrameBuffer, or a
+                StreamRecording, which is finished with export_gif_stream()
             output_path: Path to save the GIF
             fps: Frames per second (default: 15)
             quality: Quality preset - 'low', 'medium', 'high' (default: 'medium')
             color_mode: Input color mode - 'RGB' or 'BGR'
+            use_gifsicle: Optimize the result with gifsicle when it is installed
+            fixed_palette: Palette to use instead of computing one - a P-mode
+                image, an ImagePalette or a flat [r, g, b, ...] list
+            release_frames: Hand the frame list over to the exporter. It is
+                emptied while frames are packed, so the raw arrays can be
+                freed early instead of living for the whole export
+            workers: Executor to quantize frames on, e.g. a shared
+                ProcessPoolExecutor. It is not shut down afterwards. By
+                default a thread pool is created for the export.
             
         Returns:
             bool: True if export successful
         """
-        if not frames:
+        if len(frames) == 0:
             raise ValueError("No frames to export")
             
+        _check_output_path(output_path)
+        
+        if isinstance(frames, StreamRecording):
+            # Already encoded while recording, only the GIF pass is left
+            return self.export_gif_stream(frames, output_path)
+            
         fps = fps or self.default_fps
         quality = quality or 'medium'
         
         try:
             # Ensure output directory exists
-            os.makedirs(os.path.dirname(os.path.abspath(output_path)) or '.', exist_ok=True)
-            
-            # Convert frames to PIL Images
-            pil_frames = []
-            for frame in frames:
-                if isinstance(frame, np.ndarray):
-                    # Handle different data types
-                    if frame.dtype != np.uint8:
-                        frame = (frame * 255).astype(np.uint8)
-                    
-                    # Convert BGR to RGB if necessary
-                    if color_mode == 'BGR':
-                        frame = frame[:, :, ::-1]  # Reverse channel order
-                    
-                    if frame.shape[2] == 3:  # RGB
-                        img = Image.fromarray(frame, mode='RGB')
-                    elif frame.shape[2] == 4:  # RGBA
-                        img = Image.fromarray(frame, mode='RGBA').convert('RGB')
-                    else:
-                        img = Image.fromarray(frame)
-                else:
-                    img = frame
-                pil_frames.append(img)
+            _ensure_output_dir(output_path)
+            
+            # Normalize uniform frames once, so the per-frame path below gets
+            # packed uint8 RGB and never has to branch on dtype or channels
+            frame_buffer = _as_frame_buffer(frames, fps, color_mode, consume=release_frames)
+            if frame_buffer is not None:
+                frames, color_mode = frame_buffer, 'RGB'
             
             # Calculate duration between frames in milliseconds
             duration = int(1000 / fps)
             
-            # Directly save without complex quantization that might cause color shifts
-            if len(pil_frames) > 1:
-                # Try to avoid quantization by using existing color information more effectively
-                # Use adaptive palette per frame instead of global palette
-                processed_frames = []
-                for img in pil_frames:
-                    # Convert to P mode with adaptive palette, but preserve original colors as much as possible
-                    if img.mode != 'P':
-                        # Convert with adaptive palette to maintain color accuracy
-                        palette_img = img.convert('P', palette=Image.Palette.ADAPTIVE, colors=256)
-                        processed_frames.append(palette_img)
-                    else:
-                        processed_frames.append(img)
-                
-                processed_frames[0].save(
-                    output_path,
-                    save_all=True,
-                    append_images=processed_frames[1:],
-                    duration=duration,
-                    loop=0,
-                    optimize=True,
-                    disposal=2  # Restore to background
-                )
+            # Static stretches of a screen recording produce runs of identical
+            # frames; keep one of each run and show it for longer instead.
+            # The recorder already merges them while capturing, this catches
+            # frames from any other source.
+            frame_durations = (frame_buffer.frame_durations(duration) if frame_buffer is not None
+                               else [duration] * len(frames))
+            frames, durations = _merge_duplicate_frames(frames, frame_durations)
+            
+            preset = QUALITY_PRESETS.get(quality, QUALITY_PRESETS['medium'])
+            
+            # Low-color content (editors, terminals) often has 256 colors or
+            # fewer over the whole clip; then its exact colors are the palette
+            # and remapping frames to it loses nothing
+            exact_codes = None
+            if fixed_palette is None and frame_buffer is not None:
+                exact_codes = palettes.clip_colors(frames, max_colors=TRANSPARENT_INDEX)
+            
+            if fixed_palette is not None:
+                global_palette_img = palettes.palette_image(fixed_palette)
+            elif exact_codes is not None:
+                global_palette_img = palettes.palette_image(exact_codes)
             else:
-                # Single frame
-                if pil_frames[0].mode == 'P':
-                    pil_frames[0].save(output_path, optimize=True)
+                # Build one palette for the whole clip, then remap every frame to it.
+                # Passing a fixed palette makes PIL do a plain nearest-color remap
+                # instead of a fresh median-cut for each frame.
+                global_palette_img = self._create_global_palette(
+                    frames, kmeans=preset['kmeans'], color_mode=color_mode,
+                    colors=TRANSPARENT_INDEX
+                )
+            palette_data = global_palette_img.getpalette()
+            
+            # Pixels that did not change since the previous frame are written
+            # with a reserved transparent index. Frames are drawn on top of
+            # each other (disposal=1), so the GIF only stores what changed and
+            # PIL crops each frame to the changed area. This needs a spare
+            # palette slot, which a caller's 256-color palette may not leave.
+            transparency = None
+            if frame_buffer is not None and len(palette_data) // 3 <= TRANSPARENT_INDEX:
+                transparency = TRANSPARENT_INDEX
+            
+            to_image = self._frame_converter(frames, color_mode)
+            
+            def quantize_frame(frame):
+                img = to_image(frame)
+                if img.mode == 'P':
+                    return img
+                if img.mode not in ('RGB', 'L'):
+                    img = img.convert('RGB')
+                return img.quantize(palette=_worker_palette_image(palette_data), dither=preset['dither'])
+            
+            # gifsicle optimizes far better and faster than PIL, so let PIL
+            # write the file as-is and only fall back to its optimizer
+            gifsicle = use_gifsicle and shutil.which('gifsicle')
+            
+            # Frames quantize in parallel and are streamed into the encoder
+            # as they finish, so no RGB copies pile up in a list. PIL still
+            # keeps every P-mode frame until it writes the file, so peak
+            # memory grows with one indexed byte per pixel and frame. Packed
+            # frames go through a module-level function taking plain arrays,
+            # so `workers` may also be a process pool.
+            with _executor(workers if frame_buffer is not None else None) as executor, \
+                    _frame_refs(frames if frame_buffer is not None else [], executor) as refs:
+                if frame_buffer is not None:
+                    encode = partial(
+                        _encode_frame,
+                        palette_data=palette_data,
+                        dither=preset['dither'],
+                        transparency=transparency,
+                    )
+                    previous = [None] + refs[:-1]
+                    frame_iter = (
+                        palettes.indexed_image(indices, palette_data, transparency)
+                        for indices in _ordered_imap(executor, encode, refs, previous,
+                                                     window=MAX_WORKERS * 2)
+                    )
+                else:
+                    frame_iter = _ordered_imap(executor, quantize_frame, frames,
+                                               window=MAX_WORKERS * 2)
+                first_frame = next(frame_iter)
+                
+                if len(frames) > 1:
+                    save_options = {}
+                    if transparency is not None:
+                        save_options['transparency'] = transparency
+                    first_frame.save(
+                        output_path,
+                        save_all=True,
+                        append_images=frame_iter,
+                        duration=durations,
+                        loop=0,
+                        optimize=not gifsicle,
+                        disposal=1,  # Draw each frame over the previous one
+                        **save_options
+                    )
                 else:
-                    # Convert to palette mode with adaptive palette
-                    palette_img = pil_frames[0].convert('P', palette=Image.Palette.ADAPTIVE, colors=256)
-                    palette_img.save(output_path, optimize=True)
+                    # Single frame
+                    first_frame.save(output_path, optimize=not gifsicle)
+            
+            if gifsicle:
+                self._optimize_with_gifsicle(output_path, lossy=preset['lossy'])
                 
             return True
             
@@ -114,7 +504,8 @@ class GIFExporter:
                          frames: List[np.ndarray],
                          output_path: str,
                          fps: Optional[int] = None,
-                         color_mode: str = 'RGB') -> bool:
+                         color_mode: str = 'RGB',
+                         workers: Optional[Executor] = None) -> bool:
         """
         Simple export method that preserves colors as much as possible
         
@@ -123,64 +514,59 @@ class GIFExporter:
             output_path: Path to save the GIF
             fps: Frames per second (default: 15)
             color_mode: Input color mode - 'RGB' or 'BGR'
+            workers: Executor to quantize frames on, e.g. a shared
+                ProcessPoolExecutor. It is not shut down afterwards.
             
         Returns:
             bool: True if export successful
         """
-        if not frames:
+        if len(frames) == 0:
             raise ValueError("No frames to export")
             
+        _check_output_path(output_path)
+            
         fps = fps or self.default_fps
         
         try:
-            os.makedirs(os.path.dirname(os.path.abspath(output_path)) or '.', exist_ok=True)
-            
-            # Convert frames to PIL Images
-            pil_frames = []
-            for frame in frames:
-                if isinstance(frame, np.ndarray):
-                    # Handle different data types
-                    if frame.dtype != np.uint8:
-                        frame = (frame * 255).astype(np.uint8)
-                    
-                    # Convert BGR to RGB if necessary
-                    if color_mode == 'BGR':
-                        frame = frame[:, :, ::-1]  # Reverse channel order
-                    
-                    if frame.shape[2] == 3:  # RGB
-                        img = Image.fromarray(frame, mode='RGB')
-                    elif frame.shape[2] == 4:  # RGBA
-                        img = Image.fromarray(frame, mode='RGBA').convert('RGB')
-                    else:
-                        img = Image.fromarray(frame)
-                else:
-                    img = frame
-                pil_frames.append(img)
+            _ensure_output_dir(output_path)
             
             duration = int(1000 / fps)
             
             # For simple export, just convert each frame individually with minimal processing
-            converted_frames = []
-            for img in pil_frames:
-                # Convert to palette mode using median cut to preserve color integrity
+            frame_buffer = _as_frame_buffer(frames, fps, color_mode)
+            to_image = self._frame_converter(frames, color_mode)
+            
+            def convert_frame(frame):
+                img = to_image(frame)
+                # Convert to palette mode with a per-frame palette to preserve color integrity
                 if img.mode != 'P':
-                    # Use a simple conversion without aggressive optimization
-                    converted = img.quantize(method=Image.Quantize.MEDIANCUT, colors=256, kmeans=0)
-                    converted_frames.append(converted)
-                else:
-                    converted_frames.append(img)
+                    return _quantize_adaptive(img)
+                return img
             
-            if len(converted_frames) > 1:
-                converted_frames[0].save(
-                    output_path,
-                    save_all=True,
-                    append_images=converted_frames[1:],
-                    duration=duration,
-                    loop=0,
-                    optimize=False  # Disable optimization to prevent color shifts
-                )
-            else:
-                converted_frames[0].save(output_path, optimize=False)
+            # One frame per worker, and finished frames go straight to the
+            # encoder, which holds on to them until the file is written.
+            # Packed frames can also be sent to a process pool.
+            with _executor(workers if frame_buffer is not None else None) as executor, \
+                    _frame_refs(list(frame_buffer) if frame_buffer is not None else [], executor) as refs:
+                if frame_buffer is not None:
+                    frame_iter = _ordered_imap(executor, _quantize_adaptive_frame, refs,
+                                               window=MAX_WORKERS * 2)
+                else:
+                    frame_iter = _ordered_imap(executor, convert_frame, frames,
+                                               window=MAX_WORKERS * 2)
+                first_frame = next(frame_iter)
+                
+                if len(frames) > 1:
+                    first_frame.save(
+                        output_path,
+                        save_all=True,
+                        append_images=frame_iter,
+                        duration=frame_buffer.frame_durations(duration) if frame_buffer is not None else duration,
+                        loop=0,
+                        optimize=False  # Disable optimization to prevent color shifts
+                    )
+                else:
+                    first_frame.save(output_path, optimize=False)
                 
             return True
             
@@ -192,7 +578,8 @@ class GIFExporter:
                                       frames: List[np.ndarray],
                                       output_path: str,
                                       fps: Optional[int] = None,
-                                      color_mode: str = 'RGB') -> bool:
+                                      color_mode: str = 'RGB',
+                                      dither: Image.Dither = Image.Dither.FLOYDSTEINBERG) -> bool:
         """
         Export using manually created palette from first frame to ensure color consistency
         
@@ -201,91 +588,80 @@ class GIFExporter:
             output_path: Path to save the GIF
             fps: Frames per second (default: 15)
             color_mode: Input color mode - 'RGB' or 'BGR'
+            dither: Dithering used when mapping frames to the shared palette
             
         Returns:
             bool: True if export successful
         """
-        if not frames:
+        if len(frames) == 0:
             raise ValueError("No frames to export")
             
+        _check_output_path(output_path)
+            
         fps = fps or self.default_fps
         
         try:
-            os.makedirs(os.path.dirname(os.path.abspath(output_path)) or '.', exist_ok=True)
-            
-            # Convert frames to PIL Images
-            pil_frames = []
-            for frame in frames:
-                if isinstance(frame, np.ndarray):
-                    # Handle different data types
-                    if frame.dtype != np.uint8:
-                        frame = (frame * 255).astype(np.uint8)
-                    
-                    # Convert BGR to RGB if necessary
-                    if color_mode == 'BGR':
-                        frame = frame[:, :, ::-1]  # Reverse channel order
-                    
-                    if frame.shape[2] == 3:  # RGB
-                        img = Image.fromarray(frame, mode='RGB')
-                    elif frame.shape[2] == 4:  # RGBA
-                        img = Image.fromarray(frame, mode='RGBA').convert('RGB')
-                    else:
-                        img = Image.fromarray(frame)
-                else:
-                    img = frame
-                pil_frames.append(img)
+            _ensure_output_dir(output_path)
+            
+            # Uniform frames are packed once; each one is then loaded into a
+            # reused RGB image right before it is remapped, instead of
+            # converting the whole recording to PIL images up front
+            frame_buffer = _as_frame_buffer(frames, fps, color_mode)
+            if frame_buffer is not None:
+                frames, color_mode = frame_buffer, 'RGB'
+            to_image = self._frame_converter(frames, color_mode)
             
             # Create a combined palette from the first few frames to capture the overall color range
-            if len(pil_frames) == 1:
+            if len(frames) == 1:
                 # Single frame - just quantize it
-                palette_img = pil_frames[0].quantize(method=Image.Quantize.MEDIANCUT, colors=256)
-                final_frames = [palette_img]
+                palette_img = to_image(frames[0]).quantize(method=Image.Quantize.MEDIANCUT, colors=256)
+                final_frames = iter([palette_img])
             else:
-                # Create palette from first few frames
-                sample_size = min(5, len(pil_frames))
-                sample_frames = pil_frames[:sample_size]
-                
-                # Combine a few frames to create a comprehensive palette
-                combined_width = sum(frame.width for frame in sample_frames[:3])
-                max_height = max(frame.height for frame in sample_frames[:3])
-                
-                # Create a wide composite image to capture all colors
-                composite = Image.new('RGB', (combined_width, max_height))
-                x_offset = 0
-                for frame in sample_frames[:3]:
-                    # Resize frame to reduce memory usage while preserving color info
-                    resized_frame = frame.resize((frame.width // 4, frame.height // 4), Image.Resampling.NEAREST)
-                    composite.paste(resized_frame, (x_offset, 0))
-                    x_offset += resized_frame.width
+                # Combine a few frames to create a comprehensive palette. The
+                # quantizer only needs the pixels, so strided samples of each
+                # frame are stacked into one strip instead of pasting resized
+                # tiles into a canvas that pads shorter frames with black.
+                sample_frames = [to_image(frames[i]) for i in range(min(3, len(frames)))]
+                sample = np.concatenate([
+                    np.asarray(img if img.mode == 'RGB' else img.convert('RGB'))[::4, ::4].reshape(-1, 3)
+                    for img in sample_frames
+                ])
                 
-                # Generate the palette from the composite
-                master_palette = composite.quantize(method=Image.Quantize.MEDIANCUT, colors=256)
+                # Generate the palette from the sampled pixels
+                master_palette = Image.fromarray(sample.reshape(-1, 1, 3)).quantize(
+                    colors=256, method=Image.Quantize.MEDIANCUT, kmeans=1
+                )
                 
-                # Apply this palette to all frames
-                final_frames = []
-                for img in pil_frames:
-                    # Apply the master palette to each frame
+                def apply_palette(frame):
+                    if frame_buffer is not None:
+                        img = _load_into_scratch(_scratch, frame)
+                    else:
+                        img = to_image(frame)
                     # First convert to RGB to ensure compatibility
-                    rgb_img = img.convert('RGB')
-                    # Then map to the master palette
-                    palette_mapped = rgb_img.im.convert('P', 0, master_palette.im)
-                    result_img = img.copy()
-                    result_img.im = palette_mapped
-                    final_frames.append(result_img)
+                    if img.mode != 'RGB':
+                        img = img.convert('RGB')
+                    # Then map to the master palette; this creates the P image.
+                    # One palette for every frame bands on gradients, which
+                    # PIL's Floyd-Steinberg error diffusion (in C) hides.
+                    return img.quantize(palette=master_palette, dither=dither)
+                
+                # Apply this palette to all frames as the encoder asks for them
+                final_frames = map(apply_palette, frames)
             
             duration = int(1000 / fps)
+            first_frame = next(final_frames)
             
-            if len(final_frames) > 1:
-                final_frames[0].save(
+            if len(frames) > 1:
+                first_frame.save(
                     output_path,
                     save_all=True,
-                    append_images=final_frames[1:],
-                    duration=duration,
+                    append_images=final_frames,
+                    duration=frame_buffer.frame_durations(duration) if frame_buffer is not None else duration,
                     loop=0,
                     optimize=False  # Avoid optimization that may change colors
                 )
             else:
-                final_frames[0].save(output_path, optimize=False)
+                first_frame.save(output_path, optimize=False)
                 
             return True
             
@@ -294,59 +670,74 @@ class GIFExporter:
             return False
     
     def export_gif_imageio(self,
-                          frames: List[np.ndarray],
+                          frames: Union[List[np.ndarray], FrameBuffer],
                           output_path: str,
                           fps: Optional[int] = None,
                           quality: Optional[str] = None,
-                          color_mode: str = 'RGB') -> bool:
+                          color_mode: str = 'RGB',
+                          dither: str = 'sierra2_4a') -> bool:
         """
         Alternative export using imageio with better quality control
         
+        Uniform frames are encoded by ffmpeg's palettegen/paletteuse filters
+        when an ffmpeg binary is available (imageio-ffmpeg ships one); the
+        shared palette is built in one multi-threaded pass. Otherwise, and
+        for frames of mixed shapes, imageio's Pillow plugin is used.
+        
         Args:
-            frames: List of numpy arrays (RGB images)
+            frames: List of numpy arrays (RGB images) or a FrameBuffer
             output_path: Path to save the GIF
             fps: Frames per second (default: 15)
             quality: Quality preset
             color_mode: Input color mode - 'RGB' or 'BGR'
+            dither: paletteuse dither mode for the ffmpeg path
             
         Returns:
             bool: True if export successful
         """
-        if not frames:
+        if len(frames) == 0:
             raise ValueError("No frames to export")
             
+        _check_output_path(output_path)
+            
         fps = fps or self.default_fps
         quality = quality or 'medium'
         
         try:
-            os.makedirs(os.path.dirname(os.path.abspath(output_path)) or '.', exist_ok=True)
-            
-            # Convert frames to uint8 if needed and handle color mode
-            processed_frames = []
-            for frame in frames:
-                if isinstance(frame, np.ndarray):
-                    # Make sure we have correct dtype
-                    if frame.dtype != np.uint8:
-                        frame = (frame * 255).astype(np.uint8)
-                    
-                    # Convert BGR to RGB if necessary
-                    if color_mode == 'BGR':
-                        frame = frame[:, :, ::-1]  # Reverse channel order
-                    
-                    if frame.shape[2] == 4:  # RGBA to RGB
-                        frame = frame[:, :, :3]
-                processed_frames.append(frame)
-            
-            duration = 1.0 / fps
-            
-            # Use imageio with specific parameters to maintain color fidelity
-            imageio.mimsave(
-                output_path,
-                processed_frames,
-                duration=duration,
-                loop=0,
-                subrectangles=False  # Avoid subrectangle optimization that can cause color issues
-            )
+            _ensure_output_dir(output_path)
+            
+            frame_buffer = _as_frame_buffer(frames, fps, color_mode)
+            if frame_buffer is not None and ffmpeg_executable() is not None:
+                return self.export_gif_ffmpeg(frame_buffer, output_path, fps=fps, dither=dither)
+            
+            def processed_frames():
+                if frame_buffer is not None:
+                    # Same shape/dtype everywhere: the frames were packed
+                    # once already, pass zero-copy views of each frame
+                    yield from frame_buffer
+                    return
+                # Heterogeneous frames: convert one by one
+                for frame in frames:
+                    if isinstance(frame, np.ndarray):
+                        if frame.ndim == 3 and frame.shape[2] in (3, 4):
+                            frame = to_packed_rgb(frame, color_mode)
+                        elif frame.dtype != np.uint8:
+                            frame = to_uint8(frame)
+                    yield frame
+            
+            # imageio's Pillow plugin takes the frame duration in milliseconds
+            duration = 1000 / fps
+            if frame_buffer is not None:
+                duration = frame_buffer.frame_durations(duration)
+            
+            # Frames are handed to the writer one at a time, so converted
+            # copies never pile up in a list of their own. The Pillow plugin
+            # still collects its images until the file is closed, and then
+            # stores each frame cropped to the box that changed since the
+            # previous one.
+            with imageio.get_writer(output_path, mode='I', duration=duration, loop=0) as writer:
+                for frame in processed_frames():
+                    writer.append_data(frame)
             
             return True
             
@@ -354,10 +745,262 @@ class GIFExporter:
             print(f"ImageIO export error: {e}")
             return False
     
-    def get_frame_info(self, frames: List[np.ndarray]) -> dict:
+    def export_gif_ffmpeg(self,
+                          frames: Union[List[np.ndarray], FrameBuffer],
+                          output_path: str,
+                          fps: Optional[int] = None,
+                          color_mode: str = 'RGB',
+                          dither: str = 'bayer') -> bool:
+        """
+        Export by piping raw frames to ffmpeg's palettegen/paletteuse filters
+        
+        Much faster than the PIL encoder for long or large recordings.
+        Uses ffmpeg from PATH, or the binary bundled with imageio-ffmpeg.
+        
+        Args:
+            frames: List of numpy arrays (RGB, BGR or 2-D gray images) or
+                PIL images, or a FrameBuffer
+            output_path: Path to save the GIF
+            fps: Frames per second (default: 15)
+            color_mode: Input color mode - 'RGB' or 'BGR'
+            dither: paletteuse dither mode, e.g. 'none', 'bayer' or 'sierra2_4a'
+            
+        Returns:
+            bool: True if export successful
+        """
+        if len(frames) == 0:
+            raise ValueError("No frames to export")
+            
+        _check_output_path(output_path)
+            
+        fps = fps or self.default_fps
+        
+        ffmpeg = ffmpeg_executable()
+        if ffmpeg is None:
+            print("FFmpeg export error: ffmpeg executable not found")
+            return False
+        
+        try:
+            _ensure_output_dir(output_path)
+            
+            # PIL images are piped as their RGB pixels, as the other
+            # exporters accept them too; arrays are packed frame by frame below
+            if not isinstance(frames, FrameBuffer):
+                frames = [np.asarray(frame.convert('RGB')) if isinstance(frame, Image.Image) else frame
+                          for frame in frames]
+                
+            height, width = frames[0].shape[:2]
+            # Raw video has no frame boundaries, so a frame of another size
+            # would shift every later one instead of failing
+            if not isinstance(frames, FrameBuffer) and any(
+                    frame.shape[:2] != (height, width) for frame in frames):
+                print("FFmpeg export error: frames must all have the same size")
+                return False
+                
+            # Ordered dithering has no serial dependency between pixels
+            if dither == 'bayer':
+                dither = 'bayer:bayer_scale=5'
+            cmd = [
+                ffmpeg, '-y', '-loglevel', 'error',
+                '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+                '-s', f'{width}x{height}', '-r', str(fps),
+                '-i', '-',
+                '-vf', f'split[s0][s1];[s0]palettegen=max_colors=256[p];[s1][p]paletteuse=dither={dither}',
+                '-loop', '0',
+                output_path
+            ]
+            
+            # Frames go through stdin as raw rgb24, no intermediate files,
+            # and leaving the block closes both pipes and waits for ffmpeg
+            with subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE) as proc:
+                try:
+                    # Frames merged at capture are written once per interval
+                    # they were on screen, keeping ffmpeg's constant frame rate
+                    repeats = frames.repeats if isinstance(frames, FrameBuffer) else None
+                    for i, frame in enumerate(frames):
+                        frame = to_packed_rgb(frame, color_mode)
+                        for _ in range(1 if repeats is None else repeats[i]):
+                            proc.stdin.write(frame)
+                finally:
+                    proc.stdin.close()
+                    stderr = proc.stderr.read()
+            
+            if proc.returncode != 0:
+                print(f"FFmpeg export error: {stderr.decode(errors='replace').strip()}")
+                return False
+                
+            return True
+            
+        except Exception as e:
+            print(f"FFmpeg export error: {e}")
+            return False
+    
+    def export_gif_stream(self,
+                          recording: StreamRecording,
+                          output_path: str,
+                          dither: str = 'sierra2_4a') -> bool:
+        """
+        Export a recording that was encoded to a temporary video on the fly
+        
+        Args:
+            recording: StreamRecording from a ScreenRecorder in stream mode
+            output_path: Path to save the GIF
+            dither: paletteuse dither mode, e.g. 'none', 'bayer' or 'sierra2_4a'
+            
+        Returns:
+            bool: True if export successful
+        """
+        if len(recording) == 0:
+            raise ValueError("No frames to export")
+            
+        _check_output_path(output_path)
+        
+        try:
+            _ensure_output_dir(output_path)
+            recording.to_gif(output_path, dither=dither)
+            return True
+            
+        except Exception as e:
+            print(f"Stream export error: {e}")
+            return False
+    
+    def _to_pil_image(self, frame, color_mode: str = 'RGB') -> Image.Image:
+        """Convert one captured frame to a PIL Image"""
+        if not isinstance(frame, np.ndarray):
+            return frame
+        
+        # Handle different data types
+        if frame.dtype != np.uint8:
+            frame = to_uint8(frame)
+        
+        # Drop alpha and convert BGR to RGB if necessary
+        if frame.ndim == 3 and (frame.shape[2], color_mode) in RGB_RAW_MODES:
+            return _rgb_image(frame, color_mode)
+        return Image.fromarray(frame)
+    
+    def _frame_converter(self, frames, color_mode: str = 'RGB'):
+        """
+        Pick the frame to PIL Image conversion once for a whole frame list
+        
+        Channel count, dtype and color mode do not change within a
+        recording, so they are looked up from the first frame only. Any
+        frame shaped differently from it falls back to _to_pil_image.
+        """
+        meta = FrameMeta.from_frame(frames[0], color_mode)
+        if meta is None or (meta.channels, color_mode) not in RGB_RAW_MODES:
+            return lambda frame: self._to_pil_image(frame, color_mode)
+        
+        needs_scaling = meta.dtype != np.uint8
+        
+        def convert(frame):
+            if not meta.matches(frame):
+                return self._to_pil_image(frame, color_mode)
+            if needs_scaling:
+                frame = to_uint8(frame)
+            return _rgb_image(frame, color_mode)
+        
+        return convert
+    
+    def _optimize_with_gifsicle(self, path: str, lossy: Optional[int] = None) -> bool:
+        """
+        Optimize a GIF in place with gifsicle
+        
+        Args:
+            path: GIF file to optimize
+            lossy: gifsicle --lossy level, or None for lossless optimization
+            
+        Returns:
+            bool: True if gifsicle succeeded
+        """
+        cmd = ['gifsicle', '-O3', '--batch', path]
+        if lossy:
+            cmd.insert(2, f'--lossy={lossy}')
+        
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"gifsicle optimization failed: {result.stderr.strip()}")
+            return False
+        return True
+    
+    def _create_global_palette(self,
+                               frames: List[np.ndarray],
+                               kmeans: int = 0,
+                               color_mode: str = 'RGB',
+                               colors: int = 256) -> Image.Image:
+        """
+        Build a single palette image from a sample of the frames
+        
+        Args:
+            frames: Frames to sample colors from
+            kmeans: Number of k-means refinement passes for the median cut
+            color_mode: Input color mode - 'RGB' or 'BGR'
+            colors: Palette size (at most 256)
+            
+        Returns:
+            Image: P-mode image whose palette can be passed to quantize()
+        """
+        # Evenly spaced frames from first to last, so the palette covers the
+        # whole recording, with the pixel budget split evenly between them
+        count = min(len(frames), PALETTE_SAMPLE_FRAMES)
+        picks = np.linspace(0, len(frames) - 1, count).round().astype(int)
+        per_frame = PALETTE_SAMPLE_PIXELS // count
+        to_image = self._frame_converter(frames, color_mode)
+        meta = FrameMeta.from_frame(frames[0], color_mode)
+        packed_rgb = meta is not None and meta.is_packed_rgb
+        
+        # The palette only depends on the pixel distribution, not on layout,
+        # so uniformly random pixels are stacked into one tall strip. A fixed
+        # seed keeps exports of the same clip identical.
+        rng = np.random.default_rng(0)
+        samples = []
+        for i in picks:
+            frame = frames[i]
+            if not (packed_rgb and meta.matches(frame)):
+                img = to_image(frame)
+                frame = np.asarray(img if img.mode == 'RGB' else img.convert('RGB'))
+            flat = frame.reshape(-1, 3)
+            # Small frames keep the old 1-in-16 density rather than drawing
+            # far more samples than there are distinct pixels
+            size = max(1, min(per_frame, len(flat) // 16))
+            samples.append(flat[rng.integers(0, len(flat), size)])
+        pixels = np.concatenate(samples)
+        composite = Image.fromarray(pixels.reshape(-1, 1, 3))
+        
+        # Median cut splits the box with the widest range along one axis.
+        # In YCbCr that axis is usually luma, which the eye resolves far
+        # better than chroma, so more slots go to visible brightness steps.
+        # PIL only median-cuts RGB images, so the YCbCr bands are passed in
+        # as if they were RGB and the palette is converted back afterwards.
+        ycc = Image.fromarray(np.asarray(composite.convert('YCbCr')))
+        quantized = ycc.quantize(colors=colors, method=Image.Quantize.MEDIANCUT, kmeans=kmeans)
+        ycc_palette = np.array(quantized.getpalette(), np.uint8).reshape(-1, 3)
+        return palettes.palette_image(palettes.ycbcr_to_rgb(ycc_palette).ravel().tolist())
+    
+    def get_frame_info(self, frames: Union[List[np.ndarray], FrameBuffer, StreamRecording]) -> dict:
         """Get information about the frames"""
-        if not frames:
+        if len(frames) == 0:
             return {}
+        
+        if isinstance(frames, StreamRecording):
+            return {
+                'count': frames.count,
+                'width': frames.width,
+                'height': frames.height,
+                'channels': 3,
+                'dtype': 'uint8',
+                'duration_seconds': frames.duration_seconds
+            }
+            
+        if isinstance(frames, FrameBuffer):
+            # Layout is fixed for the whole buffer, no need to look at a frame
+            return {
+                'count': frames.count,
+                'width': frames.width,
+                'height': frames.height,
+                'channels': 3,
+                'dtype': str(frames[0].dtype),
+                'duration_seconds': frames.duration_seconds
+            }
             
         first_frame = frames[0]
         return {
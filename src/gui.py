@@ -104,8 +104,8 @@ class OpenCutApp:
         # Create UI
         self.create_ui()
         
-        # Update timer
-        self.update_status()
+        # Progress poll, scheduled only while recording
+        self.status_after_id = None
         
     def center_window(self):
         """Center the window on screen"""
@@ -274,8 +274,9 @@ class OpenCutApp:
         self.export_btn.config(state=tk.DISABLED)
         self.status_label.config(text="🔴 Recording...", foreground='red')
         
-        # Start recording in thread
-        self.recorder.start_recording(callback=self.on_frame_captured)
+        # Start recording in thread; progress comes back via update_status
+        self.recorder.start_recording()
+        self.update_status()
         
     def stop_recording(self):
         """Stop screen recording"""
@@ -283,7 +284,13 @@ class OpenCutApp:
             return
             
         self.is_recording = False
-        frames = self.recorder.stop_recording()
+        self.recorder.stop_recording()
+        # Counted per capture; the recording itself stores repeated
+        # captures only once
+        frame_count = self.recorder.get_frame_count()
+        if self.status_after_id is not None:
+            self.root.after_cancel(self.status_after_id)
+        self.update_status()  # Show the final frame count
         
         self.record_btn.config(text="🔴 Start Recording")
         self.select_btn.config(state=tk.NORMAL)
@@ -291,10 +298,10 @@ class OpenCutApp:
         self.status_label.config(text="Recording stopped - Ready to export", foreground='black')
         
         messagebox.showinfo("Recording Complete", 
-                          f"Captured {len(frames)} frames\nClick 'Export GIF' to save")
+                          f"Captured {frame_count} frames\nClick 'Export GIF' to save")
         
     def on_frame_captured(self, frame_count):
-        """Callback when frame is captured"""
+        """Show the latest frame count, on the Tk thread"""
         self.frame_label.config(text=f"Frames: {frame_count}")
         duration = frame_count / self.fps_var.get()
         self.duration_label.config(text=f"Duration: {duration:.1f}s")
@@ -322,40 +329,55 @@ class OpenCutApp:
             
         # Show progress
         self.status_label.config(text="Exporting GIF...")
-        self.root.update()
+        self.export_btn.config(state=tk.DISABLED)
+        fps = self.fps_var.get()
+        
+        # Export off the Tk thread so the window keeps redrawing; the
+        # result is handed back to the mainloop with root.after
+        def work():
+            try:
+                success = self.exporter.export_gif(frames, file_path, fps=fps)
+                self.root.after(0, self._export_done, success, file_path, None)
+            except Exception as e:
+                self.root.after(0, self._export_done, False, file_path, e)
+                
+        threading.Thread(target=work, daemon=True).start()
         
-        try:
-            success = self.exporter.export_gif(
-                frames, 
-                file_path, 
-                fps=self.fps_var.get()
-            )
+    def _export_done(self, success, file_path, error=None):
+        """Report the result of a background export"""
+        # A recording started meanwhile keeps Export disabled until it stops
+        if not self.recorder.is_recording():
+            self.export_btn.config(state=tk.NORMAL)
+        
+        if error is not None:
+            self.status_label.config(text=f"Export error: {str(error)}")
+            messagebox.showerror("Export Error", str(error))
+            return
             
-            if success:
-                self.last_gif_path = file_path
-                file_size = os.path.getsize(file_path) / 1024  # KB
-                self.status_label.config(
-                    text=f"✓ Saved: {os.path.basename(file_path)} ({file_size:.1f} KB)"
-                )
-                messagebox.showinfo("Export Complete", 
-                                  f"GIF saved to:\n{file_path}\n\nSize: {file_size:.1f} KB")
-            else:
-                self.status_label.config(text="Export failed")
-                messagebox.showerror("Export Failed", "Failed to export GIF")
-                
-        except Exception as e:
-            self.status_label.config(text=f"Export error: {str(e)}")
-            messagebox.showerror("Export Error", str(e))
+        if success:
+            self.last_gif_path = file_path
+            file_size = os.path.getsize(file_path) / 1024  # KB
+            self.status_label.config(
+                text=f"✓ Saved: {os.path.basename(file_path)} ({file_size:.1f} KB)"
+            )
+            messagebox.showinfo("Export Complete", 
+                              f"GIF saved to:\n{file_path}\n\nSize: {file_size:.1f} KB")
+        else:
+            self.status_label.config(text="Export failed")
+            messagebox.showerror("Export Failed", "Failed to export GIF")
             
     def update_status(self):
-        """Update status periodically"""
-        if self.is_recording:
-            frame_count = self.recorder.get_frame_count()
-            self.frame_label.config(text=f"Frames: {frame_count}")
-            duration = frame_count / self.fps_var.get()
-            self.duration_label.config(text=f"Duration: {duration:.1f}s")
+        """Show recording progress, rescheduling itself while recording"""
+        # Counts queued by the capture thread are drained here, so widgets
+        # are only ever touched from the Tk thread. An idle window has
+        # nothing to poll for and never wakes up.
+        frame_count = self.recorder.poll_frame_count()
+        if frame_count is not None:
+            self.on_frame_captured(frame_count)
             
-        self.root.after(100, self.update_status)
+        self.status_after_id = None
+        if self.is_recording:
+            self.status_after_id = self.root.after(100, self.update_status)
         
     def run(self):
         """Start the application"""
@@ -16,13 +16,17 @@ import tkinter as tk
 import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from src.recorder import ScreenRecorder
-from src.gif_exporter import GIFExporter
+# GIFExporter (imageio, PIL, palette code) is imported on first export,
+# and ffmpeg is only looked for once low-memory mode is switched on
 
 
 # Set customtkinter theme
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
 
+# Drag updates are applied at most once per this many ms (about 60 Hz)
+DRAG_REDRAW_MS = 16
+
 
 class ModernAreaSelector:
     """Modern fullscreen overlay for selecting screen area"""
@@ -40,7 +44,8 @@ class ModernAreaSelector:
         
         self.start_x = None
         self.start_y = None
-        self.rect = None
+        self.drag_pos = None
+        self.drag_after_id = None
         
         # Get screen dimensions
         screen_width = self.root.winfo_screenwidth()
@@ -62,6 +67,20 @@ class ModernAreaSelector:
             font=('Microsoft YaHei', 18)
         )
         
+        # The selection and its size label are created once, hidden, and
+        # only moved while dragging. The outline is left unfilled so each
+        # update redraws its perimeter rather than the whole area.
+        self.rect = self.canvas.create_rectangle(
+            0, 0, 0, 0,
+            outline='#00d4ff', width=3, state='hidden'
+        )
+        self.dim_text = self.canvas.create_text(
+            0, 0,
+            fill='white',
+            font=('Microsoft YaHei', 14, 'bold'),
+            state='hidden'
+        )
+        
         # Bindings
         self.canvas.bind('<Button-1>', self.on_click)
         self.canvas.bind('<B1-Motion>', self.on_drag)
@@ -71,28 +90,35 @@ class ModernAreaSelector:
     def on_click(self, event):
         self.start_x = event.x
         self.start_y = event.y
+        self.drag_pos = None
+        self.canvas.coords(self.rect, event.x, event.y, event.x, event.y)
+        self.canvas.coords(self.dim_text, event.x, event.y)
+        self.canvas.itemconfigure(self.rect, state='normal')
+        self.canvas.itemconfigure(self.dim_text, text="0 x 0", state='normal')
         
     def on_drag(self, event):
-        if self.rect:
-            self.canvas.delete(self.rect)
-        self.rect = self.canvas.create_rectangle(
-            self.start_x, self.start_y, event.x, event.y,
-            outline='#00d4ff', width=3, fill='#00d4ff'
-        )
+        # Motion events can arrive far faster than the screen refreshes, so
+        # only the latest position is kept and drawn on a short timer
+        self.drag_pos = (event.x, event.y)
+        if self.drag_after_id is None:
+            self.drag_after_id = self.root.after(DRAG_REDRAW_MS, self.flush_drag)
+            
+    def flush_drag(self):
+        self.drag_after_id = None
+        if self.drag_pos is None:
+            return
+        x, y = self.drag_pos
+        self.canvas.coords(self.rect, self.start_x, self.start_y, x, y)
         # Update dimensions text
-        width = abs(event.x - self.start_x)
-        height = abs(event.y - self.start_y)
-        if hasattr(self, 'dim_text'):
-            self.canvas.delete(self.dim_text)
-        self.dim_text = self.canvas.create_text(
-            (self.start_x + event.x) // 2,
-            (self.start_y + event.y) // 2,
-            text=f"{width} x {height}",
-            fill='white',
-            font=('Microsoft YaHei', 14, 'bold')
-        )
+        width = abs(x - self.start_x)
+        height = abs(y - self.start_y)
+        self.canvas.coords(self.dim_text, (self.start_x + x) // 2, (self.start_y + y) // 2)
+        self.canvas.itemconfigure(self.dim_text, text=f"{width} x {height}")
         
     def on_release(self, event):
+        if self.drag_after_id is not None:
+            self.root.after_cancel(self.drag_after_id)
+            self.drag_after_id = None
         if self.start_x and self.start_y:
             x1 = min(self.start_x, event.x)
             y1 = min(self.start_y, event.y)
@@ -110,6 +136,8 @@ class ModernAreaSelector:
         self.root.destroy()
         
     def on_cancel(self, event=None):
+        if self.drag_after_id is not None:
+            self.root.after_cancel(self.drag_after_id)
         self.root.destroy()
 
 
@@ -128,7 +156,8 @@ class OpenCutModernApp:
         
         # Initialize components
         self.recorder = ScreenRecorder()
-        self.exporter = GIFExporter()
+        self.exporter = None
+        self.ffmpeg_found = None  # Probed on the first low-memory toggle
         
         # State
         self.capture_area = None
@@ -138,8 +167,8 @@ class OpenCutModernApp:
         # Create UI
         self.create_modern_ui()
         
-        # Start update loop
-        self.update_status()
+        # Progress poll, scheduled only while recording
+        self.status_after_id = None
         
     def create_modern_ui(self):
         """Create modern user interface"""
@@ -252,16 +281,19 @@ class OpenCutModernApp:
         stats_frame = CTkFrame(left_panel, fg_color="#252535", corner_radius=10)
         stats_frame.pack(fill="x", padx=20, pady=10)
         
+        # Bound to variables so ticking updates only redraw the text
+        self.frames_var = ctk.StringVar(value="🎞️ 帧数: 0")
         self.frames_label = CTkLabel(
             stats_frame,
-            text="🎞️ 帧数: 0",
+            textvariable=self.frames_var,
             font=("Microsoft YaHei", 14)
         )
         self.frames_label.pack(pady=5)
         
+        self.duration_var = ctk.StringVar(value="⏱️ 时长: 0.0s")
         self.duration_label = CTkLabel(
             stats_frame,
-            text="⏱️ 时长: 0.0s",
+            textvariable=self.duration_var,
             font=("Microsoft YaHei", 14)
         )
         self.duration_label.pack(pady=5)
@@ -369,6 +401,17 @@ class OpenCutModernApp:
         )
         self.quality_menu.pack(fill="x", pady=5)
         
+        # Low-memory mode: frames are encoded by ffmpeg while recording
+        self.stream_var = ctk.BooleanVar(value=False)
+        self.stream_switch = CTkSwitch(
+            quality_frame,
+            text="边录边编码 (省内存)",
+            variable=self.stream_var,
+            font=("Microsoft YaHei", 12),
+            command=self.on_stream_toggle
+        )
+        self.stream_switch.pack(anchor="w", pady=5)
+        
         # Shortcuts info
         shortcuts_frame = CTkFrame(right_panel, fg_color="#252535", corner_radius=10)
         shortcuts_frame.pack(fill="x", padx=20, pady=20, side="bottom")
@@ -413,6 +456,18 @@ class OpenCutModernApp:
         """Update FPS label when slider changes"""
         self.fps_value_label.configure(text=f"{int(value)} FPS")
         
+    def on_stream_toggle(self):
+        """Check for ffmpeg the first time low-memory mode is switched on"""
+        if not self.stream_var.get():
+            return
+        if self.ffmpeg_found is None:
+            from src.stream_encoder import ffmpeg_executable
+            self.ffmpeg_found = ffmpeg_executable() is not None
+        if not self.ffmpeg_found:
+            self.stream_var.set(False)
+            self.stream_switch.configure(state="disabled")
+            messagebox.showwarning("提示", "未找到 ffmpeg，无法边录边编码")
+            
     def show_settings(self):
         """Show settings dialog"""
         # Could add more settings here
@@ -454,6 +509,7 @@ class OpenCutModernApp:
             
         self.is_recording = True
         self.recorder.fps = self.fps_var.get()
+        self.recorder.stream_encode = self.stream_var.get()
         
         self.record_btn.configure(text="⏹ 停止录制")
         self.select_btn.configure(state="disabled")
@@ -461,8 +517,9 @@ class OpenCutModernApp:
         self.status_text.configure(text="🔴 正在录制...")
         self.status_indicator.configure(text_color="#ef4444")  # Red
         
-        # Start recording in thread
-        self.recorder.start_recording(callback=self.on_frame_captured)
+        # Start recording in thread; progress comes back via update_status
+        self.recorder.start_recording()
+        self.update_status()
         
     def stop_recording(self):
         """Stop screen recording"""
@@ -470,7 +527,13 @@ class OpenCutModernApp:
             return
             
         self.is_recording = False
-        frames = self.recorder.stop_recording()
+        self.recorder.stop_recording()
+        # Counted per capture; the recording itself stores repeated
+        # captures only once
+        frame_count = self.recorder.get_frame_count()
+        if self.status_after_id is not None:
+            self.root.after_cancel(self.status_after_id)
+        self.update_status()  # Show the final frame count
         
         self.record_btn.configure(text="🔴 开始录制")
         self.select_btn.configure(state="normal")
@@ -478,13 +541,15 @@ class OpenCutModernApp:
         self.status_text.configure(text="录制完成，可导出")
         self.status_indicator.configure(text_color="#4ade80")  # Green
         
-        messagebox.showinfo("完成", f"已捕获 {len(frames)} 帧\n点击'导出GIF'保存文件")
+        messagebox.showinfo("完成", f"已捕获 {frame_count} 帧\n点击'导出GIF'保存文件")
         
     def on_frame_captured(self, frame_count):
-        """Callback when frame is captured"""
-        self.frames_label.configure(text=f"🎞️ 帧数: {frame_count}")
+        """Show the latest frame count, on the Tk thread"""
         duration = frame_count / self.fps_var.get()
-        self.duration_label.configure(text=f"⏱️ 时长: {duration:.1f}s")
+        for var, text in ((self.frames_var, f"🎞️ 帧数: {frame_count}"),
+                          (self.duration_var, f"⏱️ 时长: {duration:.1f}s")):
+            if var.get() != text:
+                var.set(text)
         
     def export_gif(self):
         """Export captured frames as GIF"""
@@ -509,45 +574,71 @@ class OpenCutModernApp:
             
         # Show progress
         self.progress_label.configure(text="⏳ 正在导出 GIF...")
-        self.root.update()
+        self.export_btn.configure(state="disabled")
         
-        try:
-            # Get quality setting
-            quality_map = {"低 (文件小)": "low", "中 (推荐)": "medium", "高 (清晰)": "high"}
-            quality = quality_map.get(self.quality_var.get(), "medium")
-            
-            success = self.exporter.export_gif(
-                frames, 
-                file_path, 
-                fps=self.fps_var.get(),
-                quality=quality
-            )
-            
-            if success:
-                self.last_gif_path = file_path
-                file_size = os.path.getsize(file_path) / 1024
-                self.progress_label.configure(
-                    text=f"✅ 已保存: {os.path.basename(file_path)} ({file_size:.1f} KB)"
+        # Get quality setting
+        quality_map = {"低 (文件小)": "low", "中 (推荐)": "medium", "高 (清晰)": "high"}
+        quality = quality_map.get(self.quality_var.get(), "medium")
+        fps = self.fps_var.get()
+        
+        # Export off the Tk thread so the window keeps redrawing; the
+        # result is handed back to the mainloop with root.after
+        def work():
+            try:
+                success = self.get_exporter().export_gif(
+                    frames, 
+                    file_path, 
+                    fps=fps,
+                    quality=quality
                 )
-                messagebox.showinfo("导出成功", 
-                                  f"文件已保存到:\n{file_path}\n\n大小: {file_size:.1f} KB")
-            else:
-                self.progress_label.configure(text="❌ 导出失败")
-                messagebox.showerror("错误", "GIF导出失败")
+                self.root.after(0, self._export_done, success, file_path, None)
+            except Exception as e:
+                self.root.after(0, self._export_done, False, file_path, e)
                 
-        except Exception as e:
-            self.progress_label.configure(text=f"❌ 错误: {str(e)}")
-            messagebox.showerror("错误", str(e))
+        threading.Thread(target=work, daemon=True).start()
+        
+    def _export_done(self, success, file_path, error=None):
+        """Report the result of a background export"""
+        # A recording started meanwhile keeps Export disabled until it stops
+        if not self.recorder.is_recording():
+            self.export_btn.configure(state="normal")
+        
+        if error is not None:
+            self.progress_label.configure(text=f"❌ 错误: {str(error)}")
+            messagebox.showerror("错误", str(error))
+            return
             
+        if success:
+            self.last_gif_path = file_path
+            file_size = os.path.getsize(file_path) / 1024
+            self.progress_label.configure(
+                text=f"✅ 已保存: {os.path.basename(file_path)} ({file_size:.1f} KB)"
+            )
+            messagebox.showinfo("导出成功", 
+                              f"文件已保存到:\n{file_path}\n\n大小: {file_size:.1f} KB")
+        else:
+            self.progress_label.configure(text="❌ 导出失败")
+            messagebox.showerror("错误", "GIF导出失败")
+            
+    def get_exporter(self):
+        """Create the GIF exporter on first use, keeping its imports off startup"""
+        if self.exporter is None:
+            from src.gif_exporter import GIFExporter
+            self.exporter = GIFExporter()
+        return self.exporter
+        
     def update_status(self):
-        """Update status periodically"""
-        if self.is_recording:
-            frame_count = self.recorder.get_frame_count()
-            self.frames_label.configure(text=f"🎞️ 帧数: {frame_count}")
-            duration = frame_count / self.fps_var.get()
-            self.duration_label.configure(text=f"⏱️ 时长: {duration:.1f}s")
+        """Show recording progress, rescheduling itself while recording"""
+        # Counts queued by the capture thread are drained here, so widgets
+        # are only ever touched from the Tk thread. An idle window has
+        # nothing to poll for and never wakes up.
+        frame_count = self.recorder.poll_frame_count()
+        if frame_count is not None:
+            self.on_frame_captured(frame_count)
             
-        self.root.after(100, self.update_status)
+        self.status_after_id = None
+        if self.is_recording:
+            self.status_after_id = self.root.after(100, self.update_status)
         
     def run(self):
         """Start the application"""
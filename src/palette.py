@@ -0,0 +1,119 @@
+"""
+Palette Module
+Exact palette detection for low-color screen content
+"""
+
+from typing import Optional, Sequence, Union
+import numpy as np
+from PIL import Image, ImagePalette
+
+
+# Frames spread over the clip that clip_colors() checks first, and the
+# stride of the pixel subsample it checks them on
+CLIP_SAMPLE_FRAMES = 32
+CLIP_SAMPLE_STEP = 4
+
+# Stride of the pixel grid clip_colors() then scans in every frame
+CLIP_SCAN_STEP = 2
+
+
+def pack_rgb(frame: np.ndarray) -> np.ndarray:
+    """Pack an (..., 3) uint8 RGB array into (...) uint32 0xRRGGBB codes"""
+    packed = frame[..., 0].astype(np.uint32) << 16
+    packed |= frame[..., 1].astype(np.uint32) << 8
+    packed |= frame[..., 2]
+    return packed
+
+
+def clip_colors(frames, max_colors: int = 256) -> Optional[np.ndarray]:
+    """
+    Find the distinct colors used across a whole recording
+    
+    A sparse subsample of frames spread over the clip is checked first, so
+    high-color clips are rejected in milliseconds wherever their detail is.
+    Then every frame is scanned on a grid of every CLIP_SCAN_STEP-th row
+    and column, marking colors in a table of all 2^24 RGB values, which is
+    several times faster than np.unique per frame. The scan stops as soon
+    as the total exceeds max_colors. A color found only off the grid is
+    left out and later remapped to its nearest palette entry.
+    
+    Args:
+        frames: Sequence of (H, W, 3) uint8 RGB frames
+        max_colors: Largest palette size accepted
+        
+    Returns:
+        ndarray: Sorted uint32 color codes, or None if there are more than
+        max_colors of them
+    """
+    seen = np.zeros(1 << 24, bool)
+    count = min(len(frames), CLIP_SAMPLE_FRAMES)
+    for i in np.linspace(0, len(frames) - 1, count).round().astype(int):
+        seen[pack_rgb(frames[i][::CLIP_SAMPLE_STEP, ::CLIP_SAMPLE_STEP])] = True
+        if np.count_nonzero(seen) > max_colors:
+            return None
+            
+    for frame in frames:
+        seen[pack_rgb(frame[::CLIP_SCAN_STEP, ::CLIP_SCAN_STEP])] = True
+        if np.count_nonzero(seen) > max_colors:
+            return None
+    return np.flatnonzero(seen).astype(np.uint32)
+
+
+def ycbcr_to_rgb(ycc: np.ndarray) -> np.ndarray:
+    """
+    Convert (..., 3) uint8 full-range YCbCr back to RGB
+    
+    Uses the ITU-R BT.601 coefficients of PIL's 'YCbCr' mode, so
+    ycbcr_to_rgb(np.asarray(img.convert('YCbCr'))) round-trips to within
+    a few levels of the original RGB.
+    """
+    y = ycc[..., 0].astype(np.float32)
+    cb = ycc[..., 1].astype(np.float32) - 128.0
+    cr = ycc[..., 2].astype(np.float32) - 128.0
+    rgb = np.stack([
+        y + 1.402 * cr,
+        y - 0.344136 * cb - 0.714136 * cr,
+        y + 1.772 * cb,
+    ], axis=-1)
+    return np.clip(np.rint(rgb), 0, 255).astype(np.uint8)
+
+
+def palette_image(palette: Union[np.ndarray, Image.Image, ImagePalette.ImagePalette, Sequence[int]]) -> Image.Image:
+    """
+    Build a P-mode image carrying a palette, for quantize(palette=...)
+    
+    Args:
+        palette: uint32 color codes, a P-mode image, an ImagePalette or a
+            flat [r, g, b, ...] sequence
+            
+    Returns:
+        Image: 1x1 P-mode image with the palette attached
+    """
+    if isinstance(palette, Image.Image):
+        return palette
+        
+    if isinstance(palette, np.ndarray):
+        rgb = np.stack([(palette >> 16) & 0xFF, (palette >> 8) & 0xFF, palette & 0xFF], axis=-1)
+        palette = rgb.astype(np.uint8).ravel().tolist()
+        
+    img = Image.new('P', (1, 1))
+    img.putpalette(palette)
+    return img
+
+
+def indexed_image(indices: np.ndarray, palette_data: Sequence[int],
+                  transparency: Optional[int] = None) -> Image.Image:
+    """
+    Wrap (H, W) uint8 palette indices as a P-mode image
+    
+    `transparency` marks an index as transparent, so PIL's GIF optimizer
+    does not mistake it for the padding color behind it.
+    """
+    if not indices.flags.c_contiguous:
+        indices = np.ascontiguousarray(indices)
+    height, width = indices.shape
+    img = Image.frombuffer('P', (width, height), indices, 'raw', 'P', 0, 1)
+    img.putpalette(palette_data)
+    if transparency is not None:
+        img.info['transparency'] = transparency
+    return img
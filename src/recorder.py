@@ -3,102 +3,255 @@ Screen Recorder Module
 Handles screen capture and frame storage
 """
 
+import os
+import queue
+import sys
 import threading
 import time
-from typing import Optional, Tuple, List, Callable
-import mss
-import mss.tools
+from typing import Optional, Tuple, List, Callable, Union
 import numpy as np
 
+try:
+    from .frame_buffer import FrameBuffer, FrameBufferWriter
+    from .stream_encoder import StreamRecording
+except ImportError:
+    from frame_buffer import FrameBuffer, FrameBufferWriter
+    from stream_encoder import StreamRecording
+
+
+# Frame counts waiting for the GUI; the oldest are dropped if it falls behind
+FRAME_QUEUE_SIZE = 32
+
+# Win32 THREAD_PRIORITY_ABOVE_NORMAL
+WIN_THREAD_PRIORITY_ABOVE_NORMAL = 1
+
+
+def _prioritize_capture_thread():
+    """
+    Make the calling thread less likely to be delayed by the rest of the app
+    
+    On Windows the thread priority is raised a step. On Linux, where raising
+    priority needs privileges, the thread is pinned to the last allowed CPU
+    instead, away from where the Tk main loop usually runs. Failures are
+    ignored, capture only gets less steady timing.
+    """
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), WIN_THREAD_PRIORITY_ABOVE_NORMAL)
+        elif hasattr(os, 'sched_setaffinity'):
+            # On Linux, pid 0 applies to the calling thread only
+            cpus = sorted(os.sched_getaffinity(0))
+            if len(cpus) > 1:
+                os.sched_setaffinity(0, {cpus[-1]})
+    except (OSError, AttributeError):
+        pass
+
 
 class ScreenRecorder:
     """Handles screen recording functionality"""
     
     def __init__(self):
-        self.recording = False
-        self.frames: List[np.ndarray] = []
+        self.frames: Union[List[np.ndarray], FrameBuffer, StreamRecording] = []
+        self.writer: Optional[FrameBufferWriter] = None
+        # Encode frames to a temporary video while recording instead of
+        # keeping them in memory; needs ffmpeg
+        self.stream_encode = False
+        self.stream: Optional[StreamRecording] = None
         self.capture_area: Optional[Tuple[int, int, int, int]] = None
         self.fps = 15
         self.thread: Optional[threading.Thread] = None
-        self.stop_event = threading.Event()
+        # Set while recording; the one flag both threads read
+        self.run_event = threading.Event()
         self.frame_callback: Optional[Callable] = None
+        self.frame_queue: queue.Queue = queue.Queue(maxsize=FRAME_QUEUE_SIZE)
         self.frame_count = 0
+        # Capture region built once per recording from capture_area
+        self.monitor: Optional[dict] = None
         
     def set_capture_area(self, x: int, y: int, width: int, height: int):
         """Set the screen area to capture"""
         self.capture_area = (x, y, width, height)
         
     def start_recording(self, callback: Optional[Callable] = None):
-        """Start recording the screen"""
-        if self.recording:
+        """
+        Start recording the screen
+        
+        `callback` is called with the frame count on the capture thread, so
+        it must not touch Tk widgets; GUIs read poll_frame_count() instead.
+        """
+        if self.run_event.is_set():
             return False
             
         if self.capture_area is None:
             raise ValueError("Capture area not set")
             
-        self.recording = True
         self.frames = []
+        self.writer = None
+        self.stream = None
         self.frame_count = 0
-        self.stop_event.clear()
+        self.frame_queue = queue.Queue(maxsize=FRAME_QUEUE_SIZE)
         self.frame_callback = callback
+        x, y, width, height = self.capture_area
+        self.monitor = {"left": x, "top": y, "width": width, "height": height}
         
+        self.run_event.set()
         self.thread = threading.Thread(target=self._capture_loop)
         self.thread.start()
         return True
         
-    def stop_recording(self) -> List[np.ndarray]:
-        """Stop recording and return captured frames"""
-        if not self.recording:
+    def stop_recording(self) -> Union[List[np.ndarray], FrameBuffer, StreamRecording]:
+        """
+        Stop recording and return captured frames
+        
+        Frames are captured straight into (N, H, W, 3) blocks, which are
+        returned as a FrameBuffer and also replace self.frames, so
+        every later export starts from ready-made uint8 RGB data. In
+        stream_encode mode the finished StreamRecording is returned instead.
+        The result is not copied: start_recording() and clear_frames()
+        replace self.frames rather than modifying it.
+        """
+        if not self.run_event.is_set():
             return []
             
-        self.recording = False
-        self.stop_event.set()
+        self.run_event.clear()
         
         if self.thread:
             self.thread.join(timeout=2.0)
             
-        return self.frames.copy()
+        if self.stream is not None:
+            try:
+                self.frames = self.stream.finish()
+            except RuntimeError as e:
+                print(f"Capture error: {e}")
+        elif self.writer is not None and len(self.writer):
+            self.frames = self.writer.finish(fps=self.fps)
+        self.writer = None
+        self.stream = None
+            
+        return self.frames
         
     def _capture_loop(self):
         """Main capture loop running in separate thread"""
+        # Imported here so it is only loaded once recording actually starts
+        import mss
+        
+        # mss handles belong to the thread that opened them, so every
+        # recording opens its own instance on its capture thread
         with mss.mss() as sct:
-            x, y, width, height = self.capture_area
-            monitor = {"left": x, "top": y, "width": width, "height": height}
+            monitor = self.monitor
+            
+            # A first grab sizes the frame store, which mss may return in
+            # physical pixels rather than the capture area's size. The thread
+            # is only pinned to one CPU once the store is open, so a stream
+            # encoder and its feeder thread do not inherit that CPU. If the
+            # grab fails, the loop below opens the store and pins instead.
+            append = None
+            try:
+                screenshot = sct.grab(monitor)
+                append = self._open_frame_store(screenshot.height, screenshot.width).append
+                _prioritize_capture_thread()
+            except Exception as e:
+                print(f"Capture error: {e}")
             
             frame_interval = 1.0 / self.fps
             
-            while self.recording and not self.stop_event.is_set():
-                start_time = time.time()
-                
+            # Frames are due on a fixed grid of absolute deadlines, so time
+            # spent grabbing does not push every later frame back
+            next_deadline = time.perf_counter() + frame_interval
+            
+            # Everything the loop calls per frame is bound to locals once
+            perf_counter = time.perf_counter
+            sleep = time.sleep
+            grab = sct.grab
+            running = self.run_event.is_set
+            publish = self._publish_frame_count
+            callback = self.frame_callback
+            
+            while running():
                 try:
                     # Capture screen
-                    screenshot = sct.grab(monitor)
+                    screenshot = grab(monitor)
                     
-                    # Convert to numpy array
-                    img = np.array(screenshot)
+                    # Convert to numpy array (a view of mss's BGRA buffer)
+                    img = np.frombuffer(screenshot.raw, np.uint8).reshape(
+                        screenshot.height, screenshot.width, 4
+                    )
                     
                     # 关键修改：去除 Alpha 透明通道，并将 BGR 反转为 RGB
-                    img = img[:, :, :3][:, :, ::-1]
-                    
-                    self.frames.append(img)
+                    # Done once here, straight into the recording's frame
+                    # block, so exports never repeat the channel work
+                    if append is None:
+                        append = self._open_frame_store(img.shape[0], img.shape[1]).append
+                        _prioritize_capture_thread()
+                    append(img, 'BGR')
                     self.frame_count += 1
+                    publish(self.frame_count)
                     
                     # Call callback if provided
-                    if self.frame_callback:
-                        self.frame_callback(self.frame_count)
+                    if callback:
+                        callback(self.frame_count)
                         
                 except Exception as e:
                     print(f"Capture error: {e}")
                     
                 # Maintain consistent frame rate
-                elapsed = time.time() - start_time
-                sleep_time = frame_interval - elapsed
+                sleep_time = next_deadline - perf_counter()
                 if sleep_time > 0:
-                    time.sleep(sleep_time)
+                    sleep(sleep_time)
+                if sleep_time < -2 * frame_interval:
+                    # Far behind after a stall: start a new grid instead of
+                    # grabbing a burst of frames to catch up
+                    next_deadline = perf_counter() + frame_interval
+                else:
+                    next_deadline += frame_interval
                     
+    def _open_frame_store(self, height: int, width: int) -> Union[FrameBufferWriter, StreamRecording]:
+        """
+        Create where this recording's frames go, once their size is known
+        
+        If the stream encoder cannot start, the recording keeps its frames
+        in memory instead of retrying on every frame.
+        """
+        if self.stream_encode:
+            try:
+                self.stream = StreamRecording(height, width, self.fps)
+                return self.stream
+            except (RuntimeError, OSError) as e:
+                print(f"Stream encoding unavailable, keeping frames in memory: {e}")
+        # Idle stretches of the screen are stored as one frame shown longer
+        self.writer = FrameBufferWriter(height, width, merge_duplicates=True)
+        return self.writer
+        
+    def _publish_frame_count(self, frame_count: int):
+        """Queue a frame count for the GUI without ever blocking capture"""
+        try:
+            self.frame_queue.put_nowait(frame_count)
+        except queue.Full:
+            try:
+                self.frame_queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.frame_queue.put_nowait(frame_count)
+            
+    def poll_frame_count(self) -> Optional[int]:
+        """
+        Drain the frame counts published by the capture thread
+        
+        Meant for the GUI thread: everything queued since the last call is
+        coalesced into the newest count, or None if nothing was captured.
+        """
+        latest = None
+        while True:
+            try:
+                latest = self.frame_queue.get_nowait()
+            except queue.Empty:
+                return latest
+                
     def is_recording(self) -> bool:
         """Check if currently recording"""
-        return self.recording
+        return self.run_event.is_set()
         
     def get_frame_count(self) -> int:
         """Get number of captured frames"""
@@ -107,4 +260,6 @@ class ScreenRecorder:
     def clear_frames(self):
         """Clear captured frames"""
         self.frames = []
+        self.writer = None
+        self.stream = None
         self.frame_count = 0
\ No newline at end of file
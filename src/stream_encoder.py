@@ -0,0 +1,199 @@
+"""
+Stream Encoder Module
+Encodes frames to a temporary lossless video while they are captured
+"""
+
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import weakref
+from typing import List, Optional
+import numpy as np
+
+try:
+    from .frame_buffer import to_packed_rgb
+except ImportError:
+    from frame_buffer import to_packed_rgb
+
+
+# Lossless codecs for the intermediate video, in order of preference.
+# libx264rgb at preset ultrafast keeps up with 1080p capture on one core
+# and shrinks screen content to a small fraction of raw RGB.
+STREAM_CODECS = [
+    ['-c:v', 'libx264rgb', '-qp', '0', '-preset', 'ultrafast'],
+    ['-c:v', 'utvideo'],
+]
+
+# Converted frames waiting for ffmpeg before capture has to wait for it
+STREAM_QUEUE_FRAMES = 8
+
+
+def ffmpeg_executable() -> Optional[str]:
+    """Find ffmpeg on PATH, falling back to the one bundled with imageio-ffmpeg"""
+    path = shutil.which('ffmpeg')
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except (ImportError, RuntimeError):
+        return None
+
+
+def _stream_codec(ffmpeg: str) -> List[str]:
+    """Pick the first intermediate codec this ffmpeg build can encode"""
+    result = subprocess.run([ffmpeg, '-hide_banner', '-encoders'], capture_output=True, text=True)
+    for codec in STREAM_CODECS:
+        if f' {codec[1]} ' in result.stdout:
+            return codec
+    raise RuntimeError("ffmpeg has no lossless encoder for stream recording")
+
+
+def _remove_file(path: str):
+    """Delete a temporary file if it is still there"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _run_ffmpeg(cmd: List[str]):
+    """Run one ffmpeg pass, raising RuntimeError with its message on failure"""
+    result = subprocess.run(cmd, stdin=subprocess.DEVNULL, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode(errors='replace').strip())
+
+
+class StreamRecording:
+    """
+    Recording encoded on the fly into a temporary lossless video
+    
+    Frames are handed to ffmpeg as they are captured instead of being kept
+    in memory, so memory use stays at a few frames however long the
+    recording runs. to_gif() then builds the GIF from the video file, and
+    the file is deleted along with the recording.
+    """
+    
+    def __init__(self, height: int, width: int, fps: int = 15):
+        ffmpeg = ffmpeg_executable()
+        if ffmpeg is None:
+            raise RuntimeError("ffmpeg executable not found")
+        self.ffmpeg = ffmpeg
+        self.height = height
+        self.width = width
+        self.fps = fps
+        self.count = 0
+        self.finished = False
+        
+        fd, self.path = tempfile.mkstemp(prefix='opencut-', suffix='.mkv')
+        os.close(fd)
+        self._cleanup = weakref.finalize(self, _remove_file, self.path)
+        
+        cmd = [
+            ffmpeg, '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+            '-s', f'{width}x{height}', '-r', str(fps),
+            '-i', '-',
+            *_stream_codec(ffmpeg),
+            self.path
+        ]
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        
+        # Pipe writes block while ffmpeg is busy, so they happen on a feeder
+        # thread and capture only waits once the queue is full
+        self._queue: queue.Queue = queue.Queue(maxsize=STREAM_QUEUE_FRAMES)
+        self._error: Optional[OSError] = None
+        self._feeder = threading.Thread(target=self._feed, daemon=True)
+        self._feeder.start()
+        
+    def _feed(self):
+        """
+        Write queued frames to ffmpeg until the end marker arrives
+        
+        count only grows here, once a frame is written, so it always matches
+        the video even if a frame is dropped.
+        """
+        stdin = self._proc.stdin
+        get = self._queue.get
+        while True:
+            try:
+                frame = get()
+            except queue.Empty:
+                break
+            if frame is None:
+                # An append() still blocked on the full queue when finish()
+                # ran lands behind the end marker, so drain what is left
+                get = self._queue.get_nowait
+                continue
+            if self._error is not None:
+                continue  # Keep draining so capture never blocks on a dead encoder
+            try:
+                stdin.write(frame)
+                self.count += 1
+            except OSError as e:
+                self._error = e
+        try:
+            stdin.close()
+        except OSError:
+            pass
+            
+    def append(self, frame: np.ndarray, color_mode: str = 'RGB'):
+        """Queue one (H, W, 3|4) frame for encoding"""
+        if frame.shape[:2] != (self.height, self.width):
+            raise ValueError(f"Expected {(self.height, self.width)} frames, got {frame.shape[:2]}")
+        if self.finished:
+            raise RuntimeError("Stream recording is already finished")
+        self._queue.put(to_packed_rgb(frame, color_mode))
+        
+    def finish(self) -> 'StreamRecording':
+        """Flush the queued frames and close the video"""
+        if self.finished:
+            return self
+        self.finished = True
+        self._queue.put(None)
+        self._feeder.join()
+        with self._proc.stderr:
+            stderr = self._proc.stderr.read()
+        self._proc.wait()
+        if self._proc.returncode != 0:
+            raise RuntimeError(f"Stream encoding failed: {stderr.decode(errors='replace').strip()}")
+        return self
+        
+    def to_gif(self, output_path: str, dither: str = 'sierra2_4a'):
+        """
+        Encode the recorded video as a GIF
+        
+        The palette is generated in one pass over the video and applied in
+        a second, so ffmpeg never has to hold the decoded clip in memory.
+        Raises RuntimeError if ffmpeg fails.
+        """
+        self.finish()
+        fd, palette_path = tempfile.mkstemp(prefix='opencut-', suffix='.png')
+        os.close(fd)
+        try:
+            _run_ffmpeg([
+                self.ffmpeg, '-y', '-loglevel', 'error',
+                '-i', self.path,
+                '-vf', 'palettegen=max_colors=256',
+                palette_path
+            ])
+            _run_ffmpeg([
+                self.ffmpeg, '-y', '-loglevel', 'error',
+                '-i', self.path, '-i', palette_path,
+                '-lavfi', f'paletteuse=dither={dither}',
+                '-loop', '0',
+                output_path
+            ])
+        finally:
+            _remove_file(palette_path)
+            
+    @property
+    def duration_seconds(self) -> float:
+        """Playback length at the recording's frame rate"""
+        return self.count / self.fps if self.fps else 0.0
+        
+    def __len__(self) -> int:
+        return self.count
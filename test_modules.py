@@ -7,8 +7,12 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 import numpy as np
+from PIL import Image
 from recorder import ScreenRecorder
+import gif_exporter
 from gif_exporter import GIFExporter
+from frame_buffer import FrameBuffer, FrameBufferWriter, to_packed_rgb
+from stream_encoder import StreamRecording, ffmpeg_executable
 
 def test_recorder():
     """Test ScreenRecorder basic functionality"""
@@ -54,6 +58,39 @@ def test_gif_exporter():
     assert info['height'] == 100, "Height mismatch"
     print("  ✓ Frame info works")
     
+    # Test FrameBuffer packing
+    fb = FrameBuffer.from_frames(frames, fps=5)
+    assert fb.data.shape == (5, 100, 100, 3), "FrameBuffer shape mismatch"
+    assert fb.data.flags['C_CONTIGUOUS'], "FrameBuffer not contiguous"
+    assert exporter.get_frame_info(fb)['duration_seconds'] == 1.0, "FrameBuffer duration mismatch"
+    gray = FrameBuffer.from_frames([np.dstack([frame[..., :1], frame[..., :1]]) for frame in frames])
+    assert np.array_equal(gray.data, np.repeat(fb.data[..., :1], 3, axis=-1)), "Gray+alpha frames not expanded"
+    flat = to_packed_rgb(frames[1][..., 0])
+    assert np.array_equal(flat, np.repeat(frames[1][..., :1], 3, axis=-1)), "2-D gray frame not expanded"
+    print("  ✓ FrameBuffer works")
+    
+    # Test FrameBufferWriter growth and BGRA input
+    writer = FrameBufferWriter(100, 100, capacity=2)
+    for frame in frames:
+        writer.append(np.dstack([frame[..., ::-1], np.full((100, 100), 255, np.uint8)]), 'BGR')
+    written = writer.finish(fps=5)
+    assert written.count == 5, "FrameBufferWriter frame count mismatch"
+    assert len(written.blocks) == 2, "FrameBufferWriter blocks copied on finish"
+    assert np.array_equal(np.stack(list(written)), fb.data), "FrameBufferWriter frames mismatch"
+    assert np.array_equal(written[-1], fb[-1]), "FrameBufferWriter indexing mismatch"
+    assert np.array_equal(written.data, fb.data), "FrameBufferWriter joined frames mismatch"
+    print("  ✓ FrameBufferWriter works")
+    
+    # Test merging repeated captures while writing
+    writer = FrameBufferWriter(100, 100, merge_duplicates=True)
+    for frame in [frames[0], frames[0], frames[1], frames[1], frames[1]]:
+        writer.append(frame)
+    merged = writer.finish(fps=5)
+    assert merged.count == 2, "Repeated captures not merged"
+    assert merged.frame_durations(200) == [400, 600], "Merged capture durations mismatch"
+    assert merged.duration_seconds == 1.0, "Merged capture duration mismatch"
+    print("  ✓ FrameBufferWriter duplicate merging works")
+    
     # Test GIF export
     test_path = "test_output.gif"
     try:
@@ -66,7 +103,130 @@ def test_gif_exporter():
         os.remove(test_path)
     except Exception as e:
         print(f"  ⚠ GIF export test skipped: {e}")
+        
+    # Test exporting an (N, H, W, 3) array
+    test_path = "test_output_array.gif"
+    for export in (exporter.export_gif, exporter.export_gif_simple,
+                   exporter.export_gif_with_manual_palette):
+        assert export(np.stack(frames), test_path, fps=5), f"{export.__name__} of an array failed"
+    print("  ✓ Array export works")
+    
+    # Cleanup
+    os.remove(test_path)
+    
+    # Test per-frame palettes with libimagequant, and PIL's median cut
+    # when it is missing
+    test_path = "test_output_liq.gif"
+    if gif_exporter.liq is None:
+        print("  ⚠ libimagequant test skipped: module not installed")
+    else:
+        assert exporter.export_gif_simple(frames, test_path, fps=5), "libimagequant export failed"
+        print("  ✓ libimagequant export works")
+    liq, gif_exporter.liq = gif_exporter.liq, None
+    try:
+        assert exporter.export_gif_simple(frames, test_path, fps=5), "Export without libimagequant failed"
+    finally:
+        gif_exporter.liq = liq
+    with Image.open(test_path) as gif:
+        assert gif.n_frames == 5, "Export without libimagequant frame count mismatch"
+        gif.seek(4)
+        assert gif.convert('RGB').getpixel((0, 0)) == (200, 120, 80), "Export without libimagequant color mismatch"
+    print("  ✓ Export without libimagequant falls back to median cut")
+    
+    # Cleanup
+    os.remove(test_path)
+    
+    # Test duplicate frame merging
+    test_path = "test_output_dupes.gif"
+    dupes = [frames[0], frames[0], frames[0], frames[1]]
+    success = exporter.export_gif(dupes, test_path, fps=5)
+    assert success, "GIF export with duplicate frames failed"
+    with Image.open(test_path) as gif:
+        assert gif.n_frames == 2, "Duplicate frames not merged"
+        assert gif.info['duration'] == 600, "Merged frame duration mismatch"
+        
+    # Frames merged at capture keep their durations
+    success = exporter.export_gif(merged, test_path, fps=5)
+    assert success, "GIF export of merged captures failed"
+    with Image.open(test_path) as gif:
+        assert gif.n_frames == 2, "Merged captures not kept"
+        assert gif.info['duration'] == 400, "Merged capture duration not kept"
+    print("  ✓ Duplicate frame merging works")
+    
+    # Cleanup
+    os.remove(test_path)
+    
+    # Test exact palette with colors that only appear in later frames
+    test_path = "test_output_exact.gif"
+    late = [frames[0], frames[0], frames[0], frames[1]]
+    success = exporter.export_gif(late, test_path, fps=5)
+    assert success, "GIF export with late colors failed"
+    with Image.open(test_path) as gif:
+        assert gif.n_frames == 2, "Frame with late colors lost"
+        gif.seek(1)
+        assert gif.convert('RGB').getpixel((0, 0)) == (50, 30, 20), "Late color not kept"
+    print("  ✓ Exact palette covers the whole clip")
     
+    # Cleanup
+    os.remove(test_path)
+    
+    # Test that delta-encoded frames decode to their sources without gifsicle
+    test_path = "test_output_delta.gif"
+    patched = frames[1].copy()
+    patched[:10, :10] = 255
+    blacked = patched.copy()
+    blacked[30:50, 30:50] = 0
+    delta = [frames[1], patched, blacked]
+    success = exporter.export_gif(delta, test_path, fps=5, use_gifsicle=False)
+    assert success, "GIF export of delta frames failed"
+    with Image.open(test_path) as gif:
+        for i, frame in enumerate(delta):
+            gif.seek(i)
+            assert np.array_equal(np.asarray(gif.convert('RGB')), frame), f"Delta frame {i} mismatch"
+    print("  ✓ Delta-encoded frames decode correctly")
+    
+    # Cleanup
+    os.remove(test_path)
+    
+    # Test that ffmpeg export rejects frames of mixed sizes
+    if ffmpeg_executable() is None:
+        print("  ⚠ FFmpeg export test skipped: ffmpeg not found")
+    else:
+        mixed = [frames[0], np.zeros((50, 100, 3), np.uint8)]
+        assert not exporter.export_gif_ffmpeg(mixed, "test_output_mixed.gif"), "Mixed frame sizes accepted"
+        assert not os.path.exists("test_output_mixed.gif"), "GIF written from mixed frame sizes"
+        print("  ✓ FFmpeg export checks frame sizes")
+        
+        # 2-D gray frames and PIL images are expanded to RGB, not piped raw
+        test_path = "test_output_gray.gif"
+        for gray_frames in ([frame[..., 0] for frame in frames],
+                            [Image.fromarray(frame[..., 0]) for frame in frames]):
+            assert exporter.export_gif_ffmpeg(gray_frames, test_path, fps=5), "FFmpeg export of gray frames failed"
+            with Image.open(test_path) as gif:
+                assert gif.n_frames == 5, "FFmpeg gray frame count mismatch"
+                assert gif.size == (100, 100), "FFmpeg gray frame size mismatch"
+        print("  ✓ FFmpeg export accepts 2-D gray frames and PIL images")
+        
+        # Cleanup
+        os.remove(test_path)
+        
+    # Test stream recording export
+    test_path = "test_output_stream.gif"
+    if ffmpeg_executable() is None:
+        print("  ⚠ Stream recording test skipped: ffmpeg not found")
+    else:
+        recording = StreamRecording(100, 100, fps=5)
+        for frame in frames:
+            recording.append(frame)
+        success = exporter.export_gif(recording.finish(), test_path)
+        assert success, "Stream recording export failed"
+        with Image.open(test_path) as gif:
+            assert gif.n_frames == 5, "Stream recording frame count mismatch"
+        print("  ✓ Stream recording export works")
+        
+        # Cleanup
+        os.remove(test_path)
+        
     print("GIFExporter tests passed!\n")
 
 def main():